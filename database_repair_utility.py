@@ -7,21 +7,79 @@ Run this if you see "Unknown" file names in the table after analysis.
 """
 
 import h5py
+import io
 import json
 import os
-from src.core.data_manager import DataManager
+from src.core.data_manager import (DataManager, read_file_index, read_file_index_bytes, write_file_index_entries,
+                                   create_file_index_table, append_file_index_entries, FILE_INDEX_TABLE_CHUNK_ROWS,
+                                   h5_open_options, PATH_LIKE_RE, EXTENSION_FILE_TYPES)
+
+# orjson is optional - it is much faster on large legacy JSON indices
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# ijson is optional - it lets the scan walk the index one entry at a time
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+def _iter_file_index(metadata_group):
+    """Yield (file_id, file_info) pairs from the file index.
+
+    For legacy JSON indices with ijson the entries are parsed lazily so healthy entries
+    are never kept around; otherwise the whole index is decoded up front.
+    """
+    if 'file_index_table' in metadata_group:
+        return read_file_index(metadata_group).items()
+    buf = read_file_index_bytes(metadata_group)
+    if IJSON_AVAILABLE:
+        return ijson.kvitems(io.BytesIO(buf), '', use_float=True)
+    return _loads(buf).items()
+
+def _convert_legacy_index(f, repaired):
+    """Rewrite a legacy JSON index as a file index table, with the repaired entries substituted.
+
+    The index is streamed a second time and appended to the table in batches, so with
+    ijson only one batch of entries is decoded at a time.
+    """
+    metadata_group = f['metadata']
+    entries = _iter_file_index(metadata_group)
+    create_file_index_table(metadata_group)
+    batch = {}
+    for file_id, file_info in entries:
+        batch[file_id] = repaired.get(file_id, file_info)
+        if len(batch) >= FILE_INDEX_TABLE_CHUNK_ROWS:
+            append_file_index_entries(f, batch)
+            batch = {}
+    append_file_index_entries(f, batch)
+    del metadata_group['file_index']
+
+# Databases up to this size are repaired in an in-memory image and written back once on close
+CORE_DRIVER_MAX_BYTES = 256 * 1024 * 1024
+
+def _open_for_repair(db_path):
+    """Open the database for writing, in memory when it is small enough."""
+    # Same cache settings as the application; libver='latest' lets attribute-heavy groups
+    # use the newer compact/dense attribute storage
+    kwargs = h5_open_options('r+')
+    if os.path.getsize(db_path) <= CORE_DRIVER_MAX_BYTES:
+        kwargs.update(driver='core', backing_store=True)
+    return h5py.File(db_path, 'r+', **kwargs)
 
 def repair_database_metadata(db_path):
     """Repair missing metadata in database file entries."""
     print(f"Repairing database: {db_path}")
     
-    with h5py.File(db_path, 'r+') as f:
-        # Load current file index
-        file_index = json.loads(f['metadata']['file_index'][()])
-        
-        repaired_count = 0
+    with _open_for_repair(db_path) as f:
+        # Scan the current file index, keeping only the entries that get repaired
+        repaired = {}
         
-        for file_id, file_info in file_index.items():
+        for file_id, file_info in _iter_file_index(f['metadata']):
             # Check if this entry needs repair
             needs_repair = False
             
@@ -34,30 +92,27 @@ def repair_database_metadata(db_path):
                     file_group = f[f'files/{file_id}']
                     
                     # Check if there are any attributes that might have the original filename
-                    for attr_name in file_group.attrs.keys():
-                        attr_value = file_group.attrs[attr_name]
-                        if isinstance(attr_value, (str, bytes)):
-                            if isinstance(attr_value, bytes):
-                                attr_value = attr_value.decode('utf-8', errors='ignore')
+                    for attr_name, attr_value in file_group.attrs.items():
+                        # Numeric and array attributes cannot hold a path - skip them before any decoding
+                        if not isinstance(attr_value, (str, bytes)):
+                            continue
+                        if isinstance(attr_value, bytes):
+                            attr_value = attr_value.decode('utf-8', errors='ignore')
+                        
+                        # Check if this looks like a file path
+                        if PATH_LIKE_RE.search(attr_value) is not None:
+                            print(f"  Found potential path in attribute {attr_name}: {attr_value}")
+                            file_info['original_path'] = attr_value
+                            file_info['file_name'] = os.path.basename(attr_value)
+                            
+                            # Try to infer file type from extension
+                            ext = os.path.splitext(attr_value)[1].lower()
+                            if ext in EXTENSION_FILE_TYPES:
+                                file_info['file_type'] = EXTENSION_FILE_TYPES[ext]
                             
-                            # Check if this looks like a file path
-                            if ('/' in attr_value or '\\' in attr_value) and ('.' in attr_value):
-                                print(f"  Found potential path in attribute {attr_name}: {attr_value}")
-                                file_info['original_path'] = attr_value
-                                file_info['file_name'] = os.path.basename(attr_value)
-                                
-                                # Try to infer file type from extension
-                                ext = os.path.splitext(attr_value)[1].lower()
-                                if ext in ['.flz', '.fld']:
-                                    file_info['file_type'] = 'flz'
-                                elif ext == '.flr':
-                                    file_info['file_type'] = 'flr'
-                                elif ext == '.flb':
-                                    file_info['file_type'] = 'flb'
-                                
-                                needs_repair = False
-                                repaired_count += 1
-                                break
+                            needs_repair = False
+                            repaired[file_id] = file_info
+                            break
                     
                     # If still no path found, create a reasonable default
                     if needs_repair:
@@ -73,13 +128,17 @@ def repair_database_metadata(db_path):
                         
                         file_info['file_name'] = os.path.basename(file_info['original_path'])
                         file_info['status'] = 'recovered'
-                        repaired_count += 1
+                        repaired[file_id] = file_info
                         print(f"  Created default metadata for {file_id}")
             
         # Save repaired file index
-        if repaired_count > 0:
-            f['metadata']['file_index'][()] = json.dumps(file_index).encode('utf-8')
-            print(f"Repaired {repaired_count} database entries")
+        if repaired:
+            if 'file_index_table' in f['metadata']:
+                # Only the repaired rows are rewritten
+                write_file_index_entries(f, repaired)
+            else:
+                _convert_legacy_index(f, repaired)
+            print(f"Repaired {len(repaired)} database entries")
         else:
             print("No entries needed repair")
     
@@ -17,6 +17,7 @@ def main():
     dpg.setup_dearpygui()
     dpg.show_viewport()
     dpg.start_dearpygui()
+    app.data_manager.close()
     dpg.destroy_context()
 
 if __name__ == '__main__':
@@ -1,46 +1,120 @@
+import os
 import pathlib
+import functools
+import operator
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 
-import pyrp
-from ResultsProcessor.API.Standard import APIStandard
-from ResultsProcessor.API.Native import APINative
-from ResultsProcessor.Utility import FLBTools, FLRTools
-from ResultsProcessor.Common import AnalysisParameters, MetaAnalysisParameters
-from ResultsProcessor.SignalProcessing import SignalProcessor
-from ResultsProcessor.OutlierRemoval import OutlierRemover
-from ResultsProcessor.API.Dev import APIDev
-from ResultsProcessor.API.NativeDev import AlgorithmModel
-from ResultsProcessor.Common.SignalProcessing import IAlgorithmModel
-from ResultsProcessor.Common import Matrix, Vector, AnalysisParameters, MetaAnalysisParameters
+# numexpr is optional - it fuses the deadtime correction into a single pass
+try:
+    import numexpr as ne
+    NUMEXPR_AVAILABLE = True
+except ImportError:
+    NUMEXPR_AVAILABLE = False
+
+# numba is optional - it compiles the deadtime correction into one parallel loop
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
 
 dt = 1e-6
 wbeam = 6.68e-6
 CHh, CHw = 6e-6, 15e-6
 CHcs = CHh*CHw
 
-metaparameters = MetaAnalysisParameters()
-metaparameters.BeamWidth = wbeam
-metaparameters.ChannelHeight = CHh
-metaparameters.ChannelWidth = CHw
-# metaparameters.CorrectionFactor = 2.34
-metaparameters.CorrectionFactor = 2.00 # to match with the FPGA results
-
-analysis_parameters = AnalysisParameters()
-analysis_parameters.DetectorDeadTime = 22e-9
-
 or_th = 5 # unit MCPS
 or_bin =  1000 # unit no of bin (1e-6s)
 
-or_parameters = MetaAnalysisParameters()
-or_parameters.OutlierIntensityThreshold = or_th # unit MCPS
-or_parameters.OutlierTotalSurroundingExcisedBins = or_bin # unit no of bin
+# pyrp boots the .NET CLR on import, which can take seconds. The ResultsProcessor types
+# and the analysis parameters are resolved by _load_pyrp() on first analysis instead,
+# so importing this module (e.g. from the UI) stays cheap.
+APIStandard = None
+FLBTools = None
+FLRTools = None
+OutlierRemover = None
+metaparameters = None
+analysis_parameters = None
+or_parameters = None
+
+def _load_pyrp():
+    """Import pyrp/ResultsProcessor and build the analysis parameters (once)."""
+    global APIStandard, FLBTools, FLRTools, OutlierRemover
+    global metaparameters, analysis_parameters, or_parameters
+    if APIStandard is not None:
+        return
+
+    import pyrp
+    from ResultsProcessor.API.Standard import APIStandard as _APIStandard
+    from ResultsProcessor.Utility import FLBTools as _FLBTools, FLRTools as _FLRTools
+    from ResultsProcessor.Common import AnalysisParameters, MetaAnalysisParameters
+    from ResultsProcessor.OutlierRemoval import OutlierRemover as _OutlierRemover
+
+    metaparameters = MetaAnalysisParameters()
+    metaparameters.BeamWidth = wbeam
+    metaparameters.ChannelHeight = CHh
+    metaparameters.ChannelWidth = CHw
+    # metaparameters.CorrectionFactor = 2.34
+    metaparameters.CorrectionFactor = 2.00 # to match with the FPGA results
+
+    analysis_parameters = AnalysisParameters()
+    analysis_parameters.DetectorDeadTime = 22e-9
+
+    or_parameters = MetaAnalysisParameters()
+    or_parameters.OutlierIntensityThreshold = or_th # unit MCPS
+    or_parameters.OutlierTotalSurroundingExcisedBins = or_bin # unit no of bin
+
+    FLBTools, FLRTools, OutlierRemover = _FLBTools, _FLRTools, _OutlierRemover
+    # Set last so a failed import above is retried on the next call
+    APIStandard = _APIStandard
 
 meta_keys = ['AutocorrelatedVolumetricFlowRate', 'AvgBackgroundIntensity', 'AvgFLSignalIntensity', 'AvgParticleTransitTime', \
              'CompensatedAnalogIntensity', 'EffectiveRecordingTime', 'ExtendedRangeFlowRate', 'FilteredMeasurement', \
                 'RecordingTime', 'SignalCV', 'SignalToBackgroundRatio', 'TotalPeakCount', 'TotalPhotonCount']
 units = ['uL/min', 'kcps', 'kcps', 'us', 'kcps', 's', 'uL/min', '', 's', '%', '', '', 'kcps']
 
+# Result frame layout and its units row (row 0) - built once, shared by every analysis.
+# The units row puts strings in every column, so the frame is allocated as object dtype
+# up front rather than letting pandas infer (and promote) a type per column.
+_RAW_RESULT_COLUMNS = meta_keys + ['WarningFlags', 'ErrorFlags', 'ExceptionMessage']
+_RESULT_COLUMNS = ['FileName', 'FilePath'] + _RAW_RESULT_COLUMNS
+_UNITS_ROW = {'FileName': 'Units', 'FilePath': '', **dict(zip(meta_keys, units)),
+              'WarningFlags': '', 'ErrorFlags': '', 'ExceptionMessage': ''}
+# Fetches all meta_keys from a MetaData object in one C-level call
+_META_GET = operator.attrgetter(*meta_keys)
+
+@functools.lru_cache(maxsize=8)
+def _saturation_limit(deadtime):
+    """Detector saturation limit in Mcps for the given deadtime in seconds."""
+    return float(np.interp(deadtime, [22e-9, 28e-9, 62e-9], [37, 30, 12]))
+
+
+def _format_flags(flags):
+    """Join a CLR flag collection into a comma separated string.
+
+    Iterates the collection directly (IEnumerable) rather than indexing it, so each
+    flag costs one enumerator step instead of a len() plus __getitem__ crossing into .NET.
+    """
+    return ', '.join(map(str, flags))
+
+
+def _bins_to_array(bins):
+    """Convert a CLR list of bin indices to an int64 array with one allocation of final size."""
+    return np.fromiter(bins, dtype=np.int64, count=len(bins))
+
+
+if NUMBA_AVAILABLE:
+    # fastmath without nnan/ninf: the correction divides by zero at the 1/deadtime pole
+    @njit(parallel=True, fastmath={'nsz', 'arcp', 'contract', 'afn', 'reassoc'}, cache=True)
+    def _deadtime_correction_kernel(out, count_rate, deadtime, saturation_limit):
+        for i in prange(count_rate.size):
+            r = count_rate[i]
+            v = r / (1.0 - r * deadtime * 1e6)
+            out[i] = 0.0 if v < 0 else (saturation_limit if v > saturation_limit else v)
+
+
 def deadtime_correction(count_rate, deadtime=22e-9):
     """
     Apply deadtime correction to count rate data.
@@ -50,14 +124,31 @@ def deadtime_correction(count_rate, deadtime=22e-9):
     Returns:
     array-like: Deadtime corrected count rate data.
     """
-    saturation_limit = np.interp(deadtime, [22e-9, 28e-9, 62e-9], [37, 30, 12])  # in Mcps
-    corrected_rate = (count_rate * 1e6) / (1 - (count_rate * 1e6 * deadtime))
-    corrected_rate *= 1e-6  # Convert back to Mcps
-    corrected_rate = np.clip(corrected_rate, 0, saturation_limit)
+    saturation_limit = _saturation_limit(deadtime)  # in Mcps
+    count_rate = np.asarray(count_rate)
+    # (r * 1e6) / (1 - r * 1e6 * deadtime) * 1e-6 simplifies to r / (1 - r * 1e6 * deadtime)
+    if NUMBA_AVAILABLE and count_rate.ndim:
+        out = np.empty(count_rate.shape, dtype=np.result_type(count_rate, 1.0))
+        _deadtime_correction_kernel(out.reshape(-1), count_rate.reshape(-1), deadtime, saturation_limit)
+        return out
+
+    if NUMEXPR_AVAILABLE:
+        return ne.evaluate(
+            "where(r / (1 - r * dt_s * 1e6) > sat, sat, where(r / (1 - r * dt_s * 1e6) < 0, 0, r / (1 - r * dt_s * 1e6)))",
+            local_dict={'r': count_rate, 'dt_s': deadtime, 'sat': saturation_limit})
+
+    # Fallback: reuse a single output buffer instead of allocating per step. It is allocated
+    # explicitly because ufuncs return a scalar rather than an array for 0-d input.
+    corrected_rate = np.empty(count_rate.shape, np.result_type(count_rate, 1.0))
+    np.multiply(count_rate, deadtime * 1e6, out=corrected_rate)
+    np.subtract(1, corrected_rate, out=corrected_rate)
+    np.divide(count_rate, corrected_rate, out=corrected_rate)
+    np.clip(corrected_rate, 0, saturation_limit, out=corrected_rate)
     return corrected_rate
 
 
 def analyze_photon_data(filename: str):
+    _load_pyrp()
     data_bytes = None
     
     if filename.lower().endswith('.flb'):
@@ -69,20 +160,27 @@ def analyze_photon_data(filename: str):
         # FLZ files contain FLR data, so we extract and read the FLR data
         import zipfile
         import tempfile
-        import os
         
         try:
             with zipfile.ZipFile(filename, 'r') as zip_file:
                 # Look for .flr file inside the zip
                 flr_files = [f for f in zip_file.namelist() if f.lower().endswith('.flr')]
-                if flr_files:
-                    # Extract the first .flr file to a temporary location
-                    flr_filename = flr_files[0]
-                    with tempfile.TemporaryDirectory() as temp_dir:
-                        extracted_path = zip_file.extract(flr_filename, temp_dir)
-                        data_bytes = FLRTools.ReadFLRData(extracted_path)
-                else:
+                if not flr_files:
                     raise ValueError("No .flr file found in the .flz archive")
+                # Read the first .flr file straight into memory
+                raw = zip_file.read(flr_files[0])
+
+            try:
+                data_bytes = FLRTools.ReadFLRData(raw)
+            except TypeError:
+                # ReadFLRData only accepts a path: spill once to RAM-backed storage if available
+                temp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+                with tempfile.NamedTemporaryFile(suffix='.flr', dir=temp_dir, delete=False) as temp_file:
+                    temp_file.write(raw)
+                try:
+                    data_bytes = FLRTools.ReadFLRData(temp_file.name)
+                finally:
+                    os.unlink(temp_file.name)
         except Exception as e:
             raise ValueError(f"Error reading .flz file: {str(e)}")
     else:
@@ -91,39 +189,63 @@ def analyze_photon_data(filename: str):
     if data_bytes is None:
         raise ValueError("Failed to read data from file")
         
-    df = pd.DataFrame(columns=['FileName', 'FilePath'] + meta_keys + ['WarningFlags', 'ErrorFlags', 'ExceptionMessage'])
-    
-    # Add the units row (row 0) using loc instead of iloc
-    df.loc[0, 'FileName'] = 'Units'
-    df.loc[0, 'FilePath'] = ''
-    for i, key in enumerate(meta_keys):
-        df.loc[0, key] = units[i]
-    # df.loc[0, 'AvgParticleTransitTime'] *= 1e6  # convert to us
-    df.loc[0, 'WarningFlags'] = ''
-    df.loc[0, 'ErrorFlags'] = ''
-    df.loc[0, 'ExceptionMessage'] = ''
-    
-    n = 1
-
     # data_or = OutlierRemover.RemoveOutliers(data_bytes, or_parameters)
     # res = APIStandard.AnalyzeData(data_or.Item2, analysis_parameters)
     res = APIStandard.AnalyzeData(data_bytes, analysis_parameters)
 
-    start_bins = np.array(res.StartBins)
-    end_bins = np.array(res.EndBins)
+    start_bins = _bins_to_array(res.StartBins)
+    end_bins = _bins_to_array(res.EndBins)
+
+    warning_flags = _format_flags(res.WarningFlags)
+    error_flags = _format_flags(res.ErrorFlags)
+
+    # Results row (row 1)
+    data_row = {'FileName': pathlib.Path(filename).name, 'FilePath': filename,
+                **dict(zip(meta_keys, _META_GET(res.MetaData))),
+                'WarningFlags': warning_flags,
+                'ErrorFlags': error_flags,
+                'ExceptionMessage': res.ExceptionMessage}
 
-    for key in meta_keys:
-        df.loc[n, key] = getattr(res.MetaData, key)
-    df.loc[n, 'WarningFlags'] = ', '.join([str(res.WarningFlags[i]) for i in range(len(res.WarningFlags))])
-    df.loc[n, 'ErrorFlags'] = ', '.join([str(res.ErrorFlags[i]) for i in range(len(res.ErrorFlags))])
-    df.loc[n, 'ExceptionMessage'] = res.ExceptionMessage
-    df.loc[n, 'FileName'] = pathlib.Path(filename).name
-    df.loc[n, 'FilePath'] = filename
-    n += 1
+    # Build the frame in one go rather than assigning cell by cell
+    df = pd.DataFrame([_UNITS_ROW, data_row], columns=_RESULT_COLUMNS, dtype=object)
 
     return df, start_bins, end_bins
 
 
+def analyze_many(filenames, workers=None):
+    """
+    Analyze several photon data files in parallel worker processes.
+    Parameters:
+    filenames (iterable of str): Paths to .flb, .flr or .flz files.
+    workers (int): Number of worker processes (default is the CPU count).
+    Returns:
+    list: (analysis_df, start_bins, end_bins) tuples in the same order as filenames.
+    """
+    filenames = list(filenames)
+    if not filenames:
+        return []
+    workers = workers or os.cpu_count() or 1
+    # Processes rather than threads since the pyrp/.NET analysis may hold the GIL
+    chunksize = max(1, len(filenames) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(analyze_photon_data, filenames, chunksize=chunksize))
+
+
+def _to_net_bytes(photon_data_array):
+    """
+    Copy a contiguous uint8 array into a .NET byte[] in a single pass.
+    Going through tobytes() would copy twice (numpy -> bytes -> byte[]).
+    """
+    try:
+        from System import Array, Byte, IntPtr
+        from System.Runtime.InteropServices import Marshal
+    except ImportError:
+        return photon_data_array.tobytes()
+    net_bytes = Array.CreateInstance(Byte, photon_data_array.size)
+    Marshal.Copy(IntPtr(photon_data_array.ctypes.data), net_bytes, 0, photon_data_array.size)
+    return net_bytes
+
+
 def analyze_photon_data_raw(photon_data_array):
     """
     Analyze photon data from raw numpy array (already extracted from database).
@@ -135,41 +257,33 @@ def analyze_photon_data_raw(photon_data_array):
     Returns:
     tuple: (analysis_df, start_bins, end_bins)
     """
+    _load_pyrp()
+
     # Convert numpy array to the format expected by the analysis tools
     if isinstance(photon_data_array, np.ndarray):
-        # Ensure it's the right data type
-        if photon_data_array.dtype != np.uint8:
-            photon_data_array = photon_data_array.astype(np.uint8)
-        data_bytes = photon_data_array.tobytes()
+        # Ensure it's a contiguous uint8 buffer (no copy if it already is)
+        photon_data_array = np.ascontiguousarray(photon_data_array, dtype=np.uint8)
+        data_bytes = _to_net_bytes(photon_data_array)
     else:
         raise ValueError("photon_data_array must be a numpy array")
     
-    # Create results DataFrame
-    df = pd.DataFrame(columns=meta_keys + ['WarningFlags', 'ErrorFlags', 'ExceptionMessage'])
-    
-    # Add the units row (row 0)
-    for i, key in enumerate(meta_keys):
-        df.loc[0, key] = units[i]
-    # df.loc[0, 'AvgParticleTransitTime'] *= 1e6  # convert to us
-    df.loc[0, 'WarningFlags'] = ''
-    df.loc[0, 'ErrorFlags'] = ''
-    df.loc[0, 'ExceptionMessage'] = ''
-    
-    n = 1
-
     # Run the analysis on the raw data
     data_or = OutlierRemover.RemoveOutliers(data_bytes, or_parameters)
     res = APIStandard.AnalyzeData(data_or.Item2, analysis_parameters)
 
-    start_bins = np.array(res.StartBins)
-    end_bins = np.array(res.EndBins)
+    start_bins = _bins_to_array(res.StartBins)
+    end_bins = _bins_to_array(res.EndBins)
+
+    warning_flags = _format_flags(res.WarningFlags)
+    error_flags = _format_flags(res.ErrorFlags)
+
+    # Results row (row 1)
+    data_row = {**dict(zip(meta_keys, _META_GET(res.MetaData))),
+                'WarningFlags': warning_flags,
+                'ErrorFlags': error_flags,
+                'ExceptionMessage': res.ExceptionMessage}
 
-    # Extract results
-    for key in meta_keys:
-        df.loc[n, key] = getattr(res.MetaData, key)
-    df.loc[n, 'WarningFlags'] = ', '.join([str(res.WarningFlags[i]) for i in range(len(res.WarningFlags))])
-    df.loc[n, 'ErrorFlags'] = ', '.join([str(res.ErrorFlags[i]) for i in range(len(res.ErrorFlags))])
-    df.loc[n, 'ExceptionMessage'] = res.ExceptionMessage
-    n += 1
+    # Build the frame in one go rather than assigning cell by cell
+    df = pd.DataFrame([_UNITS_ROW, data_row], columns=_RAW_RESULT_COLUMNS, dtype=object)
 
     return df, start_bins, end_bins
\ No newline at end of file
@@ -1,13 +1,47 @@
+import numpy as np
 import pandas as pd
 
-def calculate_mean(dataframe, column_name):
-    """Calculates the mean of a column."""
-    if dataframe is not None and column_name in dataframe.columns:
-        return dataframe[column_name].mean()
+def _as_float(values):
+    """Returns values as a float ndarray; entries that are not numbers become NaN."""
+    if values.dtype.kind in 'biuf':
+        return values.astype(np.float64, copy=False)
+    return np.asarray(pd.to_numeric(values, errors='coerce'), dtype=np.float64)
+
+def _column_values(data, column_name):
+    """Returns the column as a float ndarray, or None if it is not available.
+
+    Accepts a DataFrame, a structured ndarray (looked up by field name) or a
+    plain ndarray (used as the column values directly). Values that are not
+    numbers are treated as missing, as pandas does.
+    """
+    if isinstance(data, pd.DataFrame):
+        if column_name not in data.columns:
+            return None
+        return pd.to_numeric(data[column_name], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    if isinstance(data, np.ndarray):
+        if data.dtype.names is None:
+            return _as_float(data)
+        if column_name not in data.dtype.names:
+            return None
+        return _as_float(data[column_name])
     return None
 
+def calculate_mean(dataframe, column_name):
+    """Calculates the mean of a column (NaN if it has no values)."""
+    values = _column_values(dataframe, column_name)
+    if values is None:
+        return None
+    if np.count_nonzero(~np.isnan(values)) == 0:
+        return np.nan
+    with np.errstate(invalid='ignore', over='ignore'):
+        return float(np.nanmean(values))
+
 def calculate_std_dev(dataframe, column_name):
-    """Calculates the standard deviation of a column."""
-    if dataframe is not None and column_name in dataframe.columns:
-        return dataframe[column_name].std()
-    return None
+    """Calculates the standard deviation of a column (NaN if it has fewer than two values)."""
+    values = _column_values(dataframe, column_name)
+    if values is None:
+        return None
+    if np.count_nonzero(~np.isnan(values)) < 2:
+        return np.nan
+    with np.errstate(invalid='ignore', over='ignore'):
+        return float(np.nanstd(values, ddof=1))
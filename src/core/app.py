@@ -1,15 +1,70 @@
 import dearpygui.dearpygui as dpg
 import pandas as pd
 import os
+import functools
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from src.ui.main_window import MainWindow
-from src.core.data_manager import DataManager
+from src.core.data_manager import DataManager, copy_database_file
 from src.core.plugin_manager import PluginManager
 
+# Diagnostics go through logging instead of print so callbacks never block on stdout;
+# without a configured handler debug messages are dropped and errors still reach stderr
+logger = logging.getLogger('App')
+
+# Default database files: (directory, file names) in search order, None meaning the working directory
+DEFAULT_DB_LOCATIONS = (
+    (None, ("data.fldb", "database.fldb", "flx_data.fldb")),
+    (os.path.join(os.path.dirname(__file__), "..", ".."), ("data.fldb",)),
+)
+
+# Errors App callbacks expect from file and database operations (h5py reports through
+# OSError/KeyError/ValueError, CSV parse errors are ValueErrors); anything else propagates
+APP_ERRORS = (OSError, KeyError, ValueError)
+
+def _report_errors(message, status_prefix=None, default=None):
+    """Decorator logging the expected errors of an App method instead of raising them.
+    
+    message is formatted with the call's positional arguments; if status_prefix is
+    given the error is also shown in the status bar.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            except APP_ERRORS as e:
+                logger.exception(f"{message.format(*args)}: {e}")
+                if status_prefix:
+                    self._status(f"{status_prefix}: {e}")
+                return default
+        return wrapper
+    return decorator
+
 class App:
+    # DataManager method used to open each supported file extension
+    _EXT_TO_METHOD = {
+        'flz': 'add_flz_file',
+        'flr': 'add_flr_file',
+        'flb': 'add_flb_file',
+        'csv': 'load_csv',
+    }
+    # Extensions stored in the database (and therefore eligible for add_files batches)
+    _DB_EXTENSIONS = frozenset(('flz', 'flr', 'flb'))
+
     def __init__(self):
         self.data_manager = DataManager()
         self.plugin_manager = PluginManager()
         self.main_window = MainWindow(self)
+        
+        # File ingestion runs off the GUI thread; the lock serializes database access
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
+        self._db_lock = threading.Lock()
+        
+        # File openers keyed by extension, bound once
+        self._openers = {ext: getattr(self.data_manager, name) for ext, name in self._EXT_TO_METHOD.items()}
 
     def setup(self):
         """Initial setup of the application."""
@@ -26,133 +81,294 @@ class App:
         pass
 
     def open_file(self, file_path):
-        """Callback to open a file."""
-        file_ext = file_path.lower().split('.')[-1]
+        """Callback to open a file.
+        
+        The ingest runs on a worker thread so the UI keeps rendering; the table
+        update is scheduled back onto the GUI thread for the next frame.
+        """
+        file_ext = os.path.splitext(file_path)[1][1:].lower()
+        if file_ext not in self._openers:
+            logger.error(f"Unsupported file type: {file_ext}")
+            return None
         
+        # CSV chunks are handed to the GUI thread through a queue as they are parsed
+        csv_chunks = queue.Queue() if file_ext == 'csv' else None
+        future = self._io_pool.submit(self._ingest_file, file_path, file_ext, csv_chunks)
+        future.add_done_callback(lambda f: self._on_file_ingested(f, file_path, file_ext))
+        if csv_chunks is not None:
+            self._schedule_csv_drain(csv_chunks, future, first=True)
+        return future
+
+    def open_files(self, file_paths):
+        """Callback to open several files; database files are added as one batch."""
+        db_paths = [path for path in file_paths if os.path.splitext(path)[1][1:].lower() in self._DB_EXTENSIONS]
+        for file_path in file_paths:
+            if file_path not in db_paths:
+                self.open_file(file_path)
+        if not db_paths:
+            return None
+        
+        future = self._io_pool.submit(self._ingest_files, db_paths)
+        future.add_done_callback(self._on_files_ingested)
+        return future
+
+    def _ingest_files(self, file_paths):
+        """Add a batch of database files and return the refreshed records (runs on the I/O worker thread)."""
+        with self._db_lock:
+            file_ids = self.data_manager.add_files(file_paths)
+            logger.debug("Added %s of %s files", sum(file_id is not None for file_id in file_ids), len(file_paths))
+            return self.data_manager.list_files()
+
+    def _on_files_ingested(self, future):
+        """Reload the table once after a batch of files was added."""
         try:
-            if file_ext == 'flz':
-                file_id = self.data_manager.add_flz_file(file_path)
-                print(f"Added FLZ file with ID: {file_id}")
-                # Refresh the table with database records
-                self.refresh_table_from_database()
-            elif file_ext == 'flr':
-                file_id = self.data_manager.add_flr_file(file_path)
-                print(f"Added FLR file with ID: {file_id}")
-                self.refresh_table_from_database()
-            elif file_ext == 'flb':
-                file_id = self.data_manager.add_flb_file(file_path)
-                print(f"Added FLB file with ID: {file_id}")
-                self.refresh_table_from_database()
-            elif file_ext == 'csv':
+            data = future.result()
+        except APP_ERRORS as e:
+            logger.exception(f"Error opening files: {e}")
+            return
+        dpg.set_frame_callback(dpg.get_frame_count() + 1, callback=lambda *args: self._show_database_records(data))
+
+    def _ingest_file(self, file_path, file_ext, csv_chunks=None):
+        """Load a file and return the data to display (runs on the I/O worker thread)."""
+        opener = self._openers[file_ext]
+        with self._db_lock:
+            if file_ext == 'csv':
                 # Legacy CSV support
-                self.data_manager.load_csv(file_path)
-                self.main_window.table_viewer.update_data(self.data_manager.get_data())
+                opener(file_path, on_chunk=csv_chunks.put)
+                return None
+            file_id = opener(file_path)
+            logger.debug("Added %s file with ID: %s", file_ext.upper(), file_id)
+            # Only the new record is fetched; the table appends it instead of reloading everything
+            if file_id is None:
+                return None
+            return self.data_manager.get_file_record(file_id)
+
+    def _on_file_ingested(self, future, file_path, file_ext):
+        """Schedule the table update on the GUI thread once an ingest finishes."""
+        try:
+            data = future.result()
+        except APP_ERRORS as e:
+            logger.exception(f"Error opening file {file_path}: {e}")
+            return
+        
+        # CSV rows are already being streamed to the table by _drain_csv_chunks
+        if file_ext == 'csv' or data is None:
+            return
+        dpg.set_frame_callback(
+            dpg.get_frame_count() + 1,
+            callback=lambda *args: self.main_window.table_viewer.append_database_record(data)
+        )
+
+    def _schedule_csv_drain(self, csv_chunks, future, first):
+        dpg.set_frame_callback(
+            dpg.get_frame_count() + 1,
+            callback=lambda *args: self._drain_csv_chunks(csv_chunks, future, first)
+        )
+
+    def _drain_csv_chunks(self, csv_chunks, future, first):
+        """Move one parsed CSV chunk into the table per frame so the UI stays responsive."""
+        try:
+            chunk = csv_chunks.get_nowait()
+        except queue.Empty:
+            chunk = None
+        
+        if chunk is not None:
+            if first:
+                self.main_window.table_viewer.update_data(chunk)
+                first = False
             else:
-                print(f"Unsupported file type: {file_ext}")
-        except Exception as e:
-            print(f"Error opening file {file_path}: {e}")
+                self.main_window.table_viewer.append_rows(chunk)
+        
+        if not (future.done() and csv_chunks.empty()):
+            self._schedule_csv_drain(csv_chunks, future, first)
+        elif future.exception() is None:
+            self._status(
+                f"Loaded {len(self.data_manager.get_data())} rows "
+                f"({self.data_manager.arrow_bytes_allocated() / 2**20:.1f} MB in Arrow buffers)"
+            )
 
+    @_report_errors("Error saving file {0}")
     def save_file(self, file_path):
         """Callback to save a file."""
-        try:
-            self.data_manager.save_csv(file_path)
-        except Exception as e:
-            print(f"Error saving file {file_path}: {e}")
+        self.data_manager.save_csv(file_path)
 
     def refresh_table_from_database(self):
-        """Refresh the table with current database records."""
+        """Refresh the table with current database records.
+        
+        The records are read on the I/O worker thread, which waits there for a running
+        ingest instead of freezing the UI, and shown on the GUI thread in the next frame.
+        """
+        future = self._io_pool.submit(self._read_database_records)
+        future.add_done_callback(self._on_database_records_read)
+        return future
+
+    def _read_database_records(self):
+        """Return the current database records (runs on the I/O worker thread)."""
+        with self._db_lock:
+            return self.data_manager.list_files()
+
+    def _on_database_records_read(self, future):
+        """Schedule the table reload on the GUI thread once the records were read."""
         try:
-            files_data = self.data_manager.list_files()
-            if files_data is not None and isinstance(files_data, pd.DataFrame):
-                self.main_window.table_viewer.load_database_records(files_data)
-                print(f"Refreshed table with {len(files_data)} database records")
-            else:
-                print("No database records found")
-        except Exception as e:
-            print(f"Error refreshing table from database: {e}")
+            data = future.result()
+        except APP_ERRORS as e:
+            logger.exception(f"Error refreshing table from database: {e}")
+            return
+        dpg.set_frame_callback(dpg.get_frame_count() + 1, callback=lambda *args: self._show_database_records(data))
 
+    def _show_database_records(self, files_data):
+        """Load database records into the table (must run on the GUI thread)."""
+        if files_data is not None and isinstance(files_data, pd.DataFrame):
+            self.main_window.table_viewer.load_database_records(files_data)
+            logger.debug("Refreshed table with %s database records", len(files_data))
+        else:
+            logger.debug("No database records found")
+
+    @_report_errors("Error getting file data for {0}")
     def get_file_data(self, file_id):
         """Get detailed file data from database."""
-        try:
-            return self.data_manager.get_file_data(file_id)
-        except Exception as e:
-            print(f"Error getting file data for {file_id}: {e}")
-            return None
+        return self.data_manager.get_file_data(file_id)
     
     def _auto_load_database(self):
         """Automatically load a default database if it exists."""
         
-        # Look for a default database file
-        default_db_paths = [
-            "data.fldb",
-            "database.fldb", 
-            "flx_data.fldb",
-            os.path.join(os.getcwd(), "data.fldb"),
-            os.path.join(os.path.dirname(__file__), "..", "..", "data.fldb")
-        ]
+        # Look for a default database file, listing each directory once instead of
+        # probing every candidate path separately; paths resolving to the same file are tried once
+        default_db_paths = []
+        seen = set()
+        for directory, names in DEFAULT_DB_LOCATIONS:
+            directory = directory or os.getcwd()
+            try:
+                with os.scandir(directory) as entries:
+                    present = {entry.name for entry in entries if entry.name in names}
+            except OSError:
+                continue
+            for name in names:
+                if name not in present:
+                    continue
+                db_path = os.path.realpath(os.path.join(directory, name))
+                if db_path not in seen:
+                    seen.add(db_path)
+                    default_db_paths.append(db_path)
         
+        current_db = self.data_manager.db_path and os.path.realpath(self.data_manager.db_path)
         for db_path in default_db_paths:
-            if os.path.exists(db_path):
-                try:
-                    print(f"Auto-loading database: {db_path}")
-                    self.data_manager.open_database(db_path)
-                    self.refresh_table_from_database()
-                    if hasattr(self.main_window, 'status_bar'):
-                        self.main_window.status_bar.set_status(f"Loaded database: {os.path.basename(db_path)}")
-                    break
-                except Exception as e:
-                    print(f"Failed to auto-load database {db_path}: {e}")
-                    continue
+            try:
+                logger.debug("Auto-loading database: %s", db_path)
+                # The data manager may already have this database open
+                if db_path != current_db:
+                    with self._db_lock:
+                        self.data_manager.open_database(db_path)
+                self.refresh_table_from_database()
+                self._status(f"Loaded database: {os.path.basename(db_path)}")
+                break
+            except APP_ERRORS as e:
+                logger.exception(f"Failed to auto-load database {db_path}: {e}")
+                continue
         else:
             # No database found, create a new one
             try:
                 default_db = "data.fldb"
-                print(f"Creating new database: {default_db}")
-                self.data_manager.create_database(default_db)
-                if hasattr(self.main_window, 'status_bar'):
-                    self.main_window.status_bar.set_status(f"Created new database: {default_db}")
-            except Exception as e:
-                print(f"Failed to create new database: {e}")
+                logger.debug("Creating new database: %s", default_db)
+                with self._db_lock:
+                    self.data_manager.create_database(default_db)
+                self._status(f"Created new database: {default_db}")
+            except APP_ERRORS as e:
+                logger.exception(f"Failed to create new database: {e}")
     
     def import_database(self, db_path):
-        """Import a database file."""
-        try:
+        """Callback to import a database file; it is opened on the I/O worker thread."""
+        self._status(f"Importing database: {os.path.basename(db_path)}...")
+        return self._io_pool.submit(self._import_database, db_path)
+    
+    @_report_errors("Error importing database {0}", status_prefix="Failed to import database")
+    def _import_database(self, db_path):
+        """Open a database file and reload the table (runs on the I/O worker thread)."""
+        with self._db_lock:
             self.data_manager.open_database(db_path)
-            self.refresh_table_from_database()
-            if hasattr(self.main_window, 'status_bar'):
-                self.main_window.status_bar.set_status(f"Imported database: {os.path.basename(db_path)}")
-            print(f"Successfully imported database: {db_path}")
-        except Exception as e:
-            print(f"Error importing database {db_path}: {e}")
-            if hasattr(self.main_window, 'status_bar'):
-                self.main_window.status_bar.set_status(f"Failed to import database: {str(e)}")
+        self.refresh_table_from_database()
+        self._status(f"Imported database: {os.path.basename(db_path)}")
+        logger.debug("Successfully imported database: %s", db_path)
     
     def export_database(self, target_path):
-        """Export current database to a new location."""
-        import shutil
+        """Callback to export the current database; the copy runs on the I/O worker thread."""
+        self._status(f"Exporting database to: {os.path.basename(target_path)}...")
+        return self._io_pool.submit(self._export_database, target_path)
+    
+    @_report_errors("Error exporting database to {0}", status_prefix="Failed to export database")
+    def _export_database(self, target_path):
+        """Copy the current database to a new location (runs on the I/O worker thread)."""
+        if not self.data_manager.db_path:
+            raise ValueError("No database currently open")
+        
+        # Close the database first so the copy is complete and not marked as open for writing
+        with self._db_lock:
+            self.data_manager.close()
+            copy_database_file(self.data_manager.db_path, target_path)
+        self._status(f"Exported database to: {os.path.basename(target_path)}")
+        logger.debug("Successfully exported database to: %s", target_path)
+    
+    def compact_database(self):
+        """Callback to compact the open database; the rewrite runs on the I/O worker thread."""
+        if not self.data_manager.db_path:
+            self._status("No database currently open to compact")
+            return None
+        
+        self._status("Compacting database...")
+        future = self._io_pool.submit(self._compact_database)
+        future.add_done_callback(self._on_database_compacted)
+        return future
+    
+    def _compact_database(self):
+        """Compact the database and return the number of bytes saved (runs on the I/O worker thread)."""
+        with self._db_lock:
+            size = os.path.getsize(self.data_manager.db_path)
+            if not self.data_manager.compact_database():
+                raise OSError(f"Could not compact {self.data_manager.db_path}")
+            return size - os.path.getsize(self.data_manager.db_path)
+    
+    def _on_database_compacted(self, future):
+        """Report the outcome of a compaction in the status bar."""
         try:
-            if not self.data_manager.db_path:
-                raise ValueError("No database currently open")
-            
-            shutil.copy2(self.data_manager.db_path, target_path)
-            if hasattr(self.main_window, 'status_bar'):
-                self.main_window.status_bar.set_status(f"Exported database to: {os.path.basename(target_path)}")
-            print(f"Successfully exported database to: {target_path}")
-        except Exception as e:
-            print(f"Error exporting database to {target_path}: {e}")
-            if hasattr(self.main_window, 'status_bar'):
-                self.main_window.status_bar.set_status(f"Failed to export database: {str(e)}")
+            message = f"Compacted database, reclaimed {future.result() / (1024 * 1024):.1f} MB"
+        except APP_ERRORS as e:
+            logger.exception(f"Error compacting database: {e}")
+            message = f"Failed to compact database: {e}"
+        self._status(message)
+    
+    def _status(self, message):
+        """Show a message in the status bar, if the main window has one.
+        
+        Messages from worker threads are shown by the GUI thread in the next frame.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            dpg.set_frame_callback(dpg.get_frame_count() + 1, callback=lambda *args: self._status(message))
+            return
+        status_bar = getattr(self.main_window, 'status_bar', None)
+        if status_bar is not None:
+            status_bar.set_status(message)
     
     def update_file_analysis(self, file_id, analysis_results):
-        """Update photon data analysis results for a file."""
-        try:
-            success = self.data_manager.update_file_analysis(file_id, analysis_results)
-            if success and hasattr(self.main_window, 'status_bar'):
-                peak_count = analysis_results.get('total_peak_count', 0)
-                self.main_window.status_bar.set_status(f"Analysis complete: {peak_count} peaks detected")
-            return success
-        except Exception as e:
-            print(f"Error updating file analysis: {e}")
-            if hasattr(self.main_window, 'status_bar'):
-                self.main_window.status_bar.set_status(f"Analysis failed: {str(e)}")
-            return False
+        """Update photon data analysis results for a file.
+        
+        The write waits for the database lock on the I/O worker thread, so callers on the GUI
+        thread never stall behind an ingest. Returns a future resolving to whether the results
+        were saved.
+        """
+        future = self._io_pool.submit(self._save_file_analysis, file_id, analysis_results)
+        future.add_done_callback(lambda f: self._on_file_analysis_saved(f, analysis_results))
+        return future
+
+    @_report_errors("Error updating file analysis", default=False)
+    def _save_file_analysis(self, file_id, analysis_results):
+        """Store analysis results and return whether that succeeded (runs on the I/O worker thread)."""
+        with self._db_lock:
+            return self.data_manager.update_file_analysis(file_id, analysis_results)
+
+    def _on_file_analysis_saved(self, future, analysis_results):
+        """Show the outcome of saving analysis results in the status bar."""
+        if future.result():
+            message = f"Analysis complete: {analysis_results.get('total_peak_count', 0)} peaks detected"
+        else:
+            message = "Analysis failed: results could not be saved"
+        self._status(message)
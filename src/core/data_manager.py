@@ -5,11 +5,134 @@ import json
 import uuid
 import os
 import numpy as np
-from pathlib import Path
+from pathlib import Path, PurePath
 from datetime import datetime
 from PIL import Image
 import io
+import atexit
+import contextlib
+import functools
+import gc
 import logging
+import queue
+import re
+from logging.handlers import QueueHandler, QueueListener
+import shutil
+import threading
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# PyArrow's multithreaded CSV parser is used for legacy CSV files when installed
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    PYARROW_AVAILABLE = True
+    # All Arrow buffers are allocated from this pool so their total size can be reported.
+    # A proxy pool is not used: buffers that outlive it would crash when they are freed.
+    ARROW_MEMORY_POOL = pa.default_memory_pool()
+except ImportError:
+    PYARROW_AVAILABLE = False
+    ARROW_MEMORY_POOL = None
+
+# orjson is optional - it encodes and decodes metadata and analysis results several times faster
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+def _json_dumps(obj):
+    """Serialize obj to JSON for storage (with orjson, numpy arrays and scalars are accepted too)."""
+    if ORJSON_AVAILABLE:
+        # Non-string keys are converted like json.dumps does; NaN and infinity become null
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj)
+
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+# msgpack is optional - analysis results are stored as compact binary blobs when installed
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+def _msgpack_default(obj):
+    """Convert numpy values that msgpack cannot pack natively."""
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+def write_analysis_results(group, results):
+    """Store an analysis results dict as group['results'].
+
+    With msgpack the dict is packed into a uint8 dataset tagged encoding='msgpack';
+    otherwise it is stored as JSON text.
+    """
+    if not MSGPACK_AVAILABLE:
+        return group.create_dataset('results', data=_json_dumps(results))
+    blob = msgpack.packb(results, use_bin_type=True, default=_msgpack_default)
+    ds = group.create_dataset('results', data=np.frombuffer(blob, dtype=np.uint8))
+    ds.attrs['encoding'] = 'msgpack'
+    return ds
+
+def is_packed_analysis_results(dataset):
+    """Return True if dataset holds msgpack-encoded analysis results."""
+    return dataset.attrs.get('encoding') == 'msgpack'
+
+def read_analysis_results(dataset):
+    """Return the analysis results dict stored by write_analysis_results (either encoding)."""
+    if is_packed_analysis_results(dataset):
+        if not MSGPACK_AVAILABLE:
+            raise ValueError("msgpack is required to read these analysis results")
+        return msgpack.unpackb(dataset[()].tobytes(), raw=False, strict_map_key=False)
+    return _json_loads(dataset[()])
+
+# imagecodecs is optional - it decodes PNG images straight into a numpy array
+try:
+    import imagecodecs
+    IMAGECODECS_AVAILABLE = True
+except ImportError:
+    IMAGECODECS_AVAILABLE = False
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def is_png(data):
+    """Whether image bytes, or an open seekable binary file, hold a PNG; the file keeps its position."""
+    if isinstance(data, bytes):
+        return data.startswith(PNG_SIGNATURE)
+    start = data.tell()
+    signature = data.read(len(PNG_SIGNATURE))
+    data.seek(start)
+    return signature == PNG_SIGNATURE
+
+def decode_image(data):
+    """Decode image file bytes, or an open binary file, into a numpy array.
+
+    PNGs are decoded by imagecodecs when installed; everything else goes through PIL,
+    whose pixel buffer is wrapped with np.asarray rather than copied a second time.
+    PIL reads an open file directly, without first reading it into a bytes object;
+    a file is only read into memory when imagecodecs decodes it. The returned array
+    may be read-only.
+    """
+    if IMAGECODECS_AVAILABLE and is_png(data):
+        return imagecodecs.png_decode(data if isinstance(data, bytes) else data.read())
+    if isinstance(data, bytes):
+        data = io.BytesIO(data)
+    return np.asarray(Image.open(data))
+
+# hdf5plugin provides the Blosc filters used for FLZ data when installed. Databases written
+# with them can only be read where hdf5plugin is installed as well.
+try:
+    import hdf5plugin
+    HDF5PLUGIN_AVAILABLE = True
+except ImportError:
+    HDF5PLUGIN_AVAILABLE = False
 
 # Set up logging with proper formatting
 def setup_logger():
@@ -32,13 +155,616 @@ def setup_logger():
     )
     console_handler.setFormatter(formatter)
     
-    logger.addHandler(console_handler)
+    # Write to the console from a background thread so logging never blocks the GUI thread
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    logger.addHandler(QueueHandler(log_queue))
     logger.propagate = False  # Prevent duplicate logs
     
-    return logger
+    return logger, listener
+
+def _output_handlers():
+    """Handlers that actually write log records (the queued console handler included)."""
+    handlers = [h for h in logger.handlers if not isinstance(h, QueueHandler)]
+    return handlers + list(log_listener.handlers)
 
 # Initialize the logger
-logger = setup_logger()
+logger, log_listener = setup_logger()
+
+# Number of get_file_data results kept in memory (each one holds the file's raw data)
+FILE_DATA_CACHE_SIZE = 16
+
+# Number of recently opened databases whose structure check is remembered
+OPENED_DB_CACHE_SIZE = 4
+
+# HDF5 raw-data chunk cache per open database handle (the default is only 1 MiB). It holds
+# 32 photon data chunks; the slot count is a prime well above the number of cached chunks
+# and w0 favours evicting chunks that were read or written completely.
+H5_CHUNK_CACHE_BYTES = 128 * 1024 * 1024
+H5_CHUNK_CACHE_SLOTS = 10007
+H5_CHUNK_CACHE_W0 = 0.75
+
+# New databases allocate file space in pages, which keeps the metadata of the many small
+# per-file groups together instead of scattering it between the raw data; the page buffer
+# then serves listing reads from memory. Older databases without pages are unaffected.
+H5_FILE_SPACE_PAGE_BYTES = 1024 * 1024
+H5_PAGE_BUFFER_BYTES = 16 * H5_FILE_SPACE_PAGE_BYTES
+
+def h5_open_options(mode):
+    """h5py.File keyword arguments used for every database opened in the given mode."""
+    kwargs = {'rdcc_nbytes': H5_CHUNK_CACHE_BYTES, 'rdcc_nslots': H5_CHUNK_CACHE_SLOTS,
+              'rdcc_w0': H5_CHUNK_CACHE_W0, 'page_buf_size': H5_PAGE_BUFFER_BYTES}
+    if mode != 'r':
+        # New objects use the latest file format (compact link storage, faster appends)
+        kwargs['libver'] = 'latest'
+    if mode == 'w':
+        kwargs.update(fs_strategy='page', fs_page_size=H5_FILE_SPACE_PAGE_BYTES, fs_persist=True)
+    return kwargs
+
+# Number of files read ahead of the importer when adding a folder of files
+READ_PREFETCH_DEPTH = 8
+
+# Number of FLZ files decoded in parallel while earlier ones are written
+FLZ_DECODE_WORKERS = os.cpu_count() or 1
+
+# Raw members of an FLZ file by file_data key; a file added on its own has them decoded
+# on this many threads (batches already decode whole files in parallel)
+FLZ_RAW_MEMBERS = {'alignment_image': 'Alignment_Image.png', 'laser_on_image': 'LaserOn_Image.png',
+                   'photon_data': 'photon_data.flr'}
+FLZ_MEMBER_WORKERS = len(FLZ_RAW_MEMBERS)
+
+# Columns of the file listing returned by list_files; the analysis columns are numeric
+# (NaN, or <NA> for the peak count, when a file has not been analysed)
+FILE_LIST_COLUMNS = ["File ID", "File Name", "File Type", "Peak Count", "Signal CV", "Avg Background", "Avg Fluorescence", "Transit Time", "Eff. Rec. Time"]
+FILE_LIST_TEXT_COLUMNS = FILE_LIST_COLUMNS[:3]
+FILE_LIST_NUMERIC_COLUMNS = FILE_LIST_COLUMNS[3:]
+
+# File index summary column shown in each numeric file listing column
+FILE_LIST_SUMMARY_FIELDS = {
+    "Peak Count": 'peak_count',
+    "Signal CV": 'signal_cv',
+    "Avg Background": 'avg_background',
+    "Avg Fluorescence": 'avg_fl_signal',
+    "Transit Time": 'transit_time',
+    "Eff. Rec. Time": 'eff_rec_time',
+}
+
+# Display formats of the numeric file listing columns
+FILE_LIST_FORMATS = {
+    "Peak Count": "{:.0f}",
+    "Signal CV": "{:.2f}",
+    "Avg Background": "{:.1f}",
+    "Avg Fluorescence": "{:.1f}",
+    "Transit Time": "{:.2f}",
+    "Eff. Rec. Time": "{:.2f}",
+}
+
+def file_list_columns(file_infos):
+    """Preallocate one array per file listing column for the given file_info dicts.
+    
+    The numeric columns are filled column by column from the file index summary
+    (NaN where an entry has none); the text columns are left to the caller.
+    """
+    n = len(file_infos)
+    columns = {col: np.empty(n, dtype=object) for col in FILE_LIST_TEXT_COLUMNS}
+    for col, name in FILE_LIST_SUMMARY_FIELDS.items():
+        columns[col] = np.fromiter((file_info.get(name, np.nan) for file_info in file_infos),
+                                   dtype=np.float64, count=n)
+    return columns
+
+def file_list_frame(columns):
+    """Build the list_files DataFrame from the arrays of file_list_columns.
+
+    Text columns are Arrow-backed where possible, so they hold one contiguous buffer
+    instead of a Python object per cell; the peak count becomes a nullable integer.
+    """
+    data = {}
+    for col in FILE_LIST_COLUMNS:
+        values = columns[col]
+        if values.dtype == object and PYARROW_AVAILABLE and len(values):
+            try:
+                values = pd.arrays.ArrowExtensionArray(pa.array(values, memory_pool=ARROW_MEMORY_POOL))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                pass
+        elif col == "Peak Count":
+            values = pd.array(values, dtype="Int64")
+        data[col] = values
+    return pd.DataFrame(data, columns=FILE_LIST_COLUMNS)
+
+def format_file_list(df):
+    """Return a copy of a list_files frame with the numeric columns formatted for display."""
+    display_df = df.copy()
+    for col, fmt in FILE_LIST_FORMATS.items():
+        if col in display_df.columns:
+            values = pd.to_numeric(display_df[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            display_df[col] = ["N/A" if np.isnan(v) else fmt.format(v) for v in values]
+    return display_df
+
+# Rows per chunk when legacy CSV files are streamed to the table without PyArrow
+CSV_CHUNK_SIZE = 65536
+
+# Databases created before the file index table store the index as JSON bytes in a resizable
+# 1-D uint8 dataset, or as a scalar string in the oldest ones. These are read for legacy
+# databases and converted to the table on the first write.
+FILE_INDEX_CHUNK_SIZE = 65536
+
+def create_file_index_dataset(metadata_group):
+    """Create an empty, resizable file index dataset in the given metadata group."""
+    return metadata_group.create_dataset('file_index', shape=(0,), maxshape=(None,),
+                                         dtype='u1', chunks=(FILE_INDEX_CHUNK_SIZE,))
+
+def read_file_index_bytes(metadata_group):
+    """Return the raw JSON bytes of the file index (either storage layout)."""
+    data = metadata_group['file_index'][()]
+    if isinstance(data, np.ndarray):
+        return data.tobytes()
+    if isinstance(data, str):
+        return data.encode('utf-8')
+    return data
+
+def write_file_index_bytes(metadata_group, buf):
+    """Write raw JSON bytes to the file index, resizing the dataset in place.
+
+    Legacy scalar string datasets are migrated to the resizable layout on first write.
+    """
+    ds = metadata_group['file_index']
+    if ds.dtype != np.uint8 or ds.maxshape != (None,):
+        del metadata_group['file_index']
+        ds = create_file_index_dataset(metadata_group)
+    data = np.frombuffer(buf, dtype=np.uint8)
+    ds.resize((len(data),))
+    ds[:] = data
+
+# Newer databases keep the file index as a compound table with one row per file, so entries
+# can be appended or updated without rewriting the whole index. Strings are UTF-8 encoded;
+# an empty string means the entry does not have that field. Paths and names have no length
+# limit, so they are variable-length; tables with the older fixed-width fields are converted.
+FILE_INDEX_DTYPE = np.dtype([
+    ('file_id', 'S36'),
+    ('original_path', h5py.string_dtype('utf-8')),
+    ('file_name', h5py.string_dtype('utf-8')),
+    ('file_type', 'S8'),
+    ('added', 'S32'),
+    ('has_alignment_image', '?'),
+    ('has_laser_on_image', '?'),
+    ('has_photon_data', '?'),
+    ('has_analysis', '?'),
+    # Summary of the analysis results, so files can be listed without decoding them (NaN if not analysed)
+    ('peak_count', 'f8'),
+    ('signal_cv', 'f8'),
+    ('avg_background', 'f8'),
+    ('avg_fl_signal', 'f8'),
+    ('transit_time', 'f8'),
+    ('eff_rec_time', 'f8'),
+])
+FILE_INDEX_TABLE_CHUNK_ROWS = 1024
+
+# Analysis result key summarised by each file index column
+ANALYSIS_SUMMARY_FIELDS = {
+    'peak_count': 'total_peak_count',
+    'signal_cv': 'signal_cv',
+    'avg_background': 'avg_background',
+    'avg_fl_signal': 'avg_fl_signal',
+    'transit_time': 'avg_particle_transit_time',
+    'eff_rec_time': 'effective_recording_time',
+}
+
+def analysis_summary(analysis_results):
+    """Return the file index summary columns for an analysis results dict."""
+    summary = {}
+    for name, key in ANALYSIS_SUMMARY_FIELDS.items():
+        value = analysis_results.get(key, 0)
+        summary[name] = np.nan if value is None else float(value)
+    return summary
+
+def read_analysis_summary(f, file_id, analysed=None):
+    """Summarise the stored analysis results of one file, or return None if it has none.
+    
+    analysed is an optional set from analysed_file_ids, which saves the lookup of
+    files without results.
+    """
+    if analysed is not None and file_id not in analysed:
+        return None
+    path = f'files/{file_id}/photon_analysis/results'
+    if path not in f:
+        return None
+    return analysis_summary(read_analysis_results(f[path]))
+
+def analysed_file_ids(f):
+    """Return the IDs of all files with photon analysis results, found in one pass over the files group."""
+    analysed = set()
+    def visit(name):
+        file_id, _, child = name.partition('/')
+        if child == 'photon_analysis/results':
+            analysed.add(file_id)
+    f['files'].visit(visit)
+    return analysed
+
+def create_file_index_table(metadata_group):
+    """Create an empty, resizable file index table in the given metadata group."""
+    return metadata_group.create_dataset('file_index_table', shape=(0,), maxshape=(None,),
+                                         dtype=FILE_INDEX_DTYPE, chunks=(FILE_INDEX_TABLE_CHUNK_ROWS,))
+
+def file_index_row(file_id, file_info, row=None):
+    """Fill a file index table row from a file_info dict; keys without a column are ignored."""
+    if row is None:
+        row = np.zeros((), dtype=FILE_INDEX_DTYPE)
+        for name in FILE_INDEX_DTYPE.names:
+            if FILE_INDEX_DTYPE[name].kind == 'O':
+                row[name] = b''
+        for name in ANALYSIS_SUMMARY_FIELDS:
+            row[name] = np.nan
+    row['file_id'] = file_id.encode('utf-8')
+    for name in FILE_INDEX_DTYPE.names[1:]:
+        if name in file_info:
+            value = file_info[name]
+            kind = FILE_INDEX_DTYPE[name].kind
+            if kind in 'SO':
+                row[name] = str(value or '').encode('utf-8')
+            elif kind == 'f':
+                row[name] = np.nan if value is None else float(value)
+            else:
+                row[name] = bool(value)
+    return row
+
+def file_index_info(row):
+    """Return the file_info dict stored in a file index table row.
+    
+    Tables written before the analysis summary columns existed simply have no
+    summary keys in their file_info.
+    """
+    file_info = {}
+    for name in row.dtype.names[1:]:
+        value = row[name]
+        if isinstance(value, bytes):
+            if value:
+                file_info[name] = value.decode('utf-8', errors='ignore')
+        elif row.dtype[name].kind == 'f':
+            file_info[name] = float(value)
+        else:
+            file_info[name] = bool(value)
+    return file_info
+
+def has_analysis_summary(file_info):
+    """Whether a file_info dict carries the analysis summary columns."""
+    return all(name in file_info for name in ANALYSIS_SUMMARY_FIELDS)
+
+def needs_path_repair(file_info):
+    """Whether a file_info dict is missing its original path."""
+    return file_info.get('original_path') in (None, '', 'Unknown')
+
+def read_file_index(metadata_group):
+    """Return the file index as {file_id: file_info} (either storage layout)."""
+    if 'file_index_table' in metadata_group:
+        rows = metadata_group['file_index_table'][()]
+        return {row['file_id'].decode('utf-8'): file_index_info(row) for row in rows}
+    if 'file_index' in metadata_group:
+        return _json_loads(read_file_index_bytes(metadata_group))
+    return {}
+
+def _file_index_positions(ds):
+    """Map file IDs to their row in the file index table, reading only the ID column."""
+    if ds.shape[0] == 0:
+        return {}
+    return {file_id.decode('utf-8'): index for index, file_id in enumerate(ds.fields('file_id')[()])}
+
+def _store_file_index_extras(f, file_id, file_info):
+    """Store file_info keys that have no file index column as attributes of the file's group."""
+    extras = {key: value for key, value in file_info.items() if key not in FILE_INDEX_DTYPE.names}
+    if not extras or file_id not in f['files']:
+        return
+    attrs = f['files'][file_id].attrs
+    for key, value in extras.items():
+        if not isinstance(value, str):
+            value = _json_dumps(value)
+            if isinstance(value, bytes):
+                value = value.decode('utf-8')
+        attrs[key] = value
+
+def _new_file_index_row(f, file_id, file_info):
+    """Build the row of a file that is not indexed yet, summarising its stored analysis if needed."""
+    if not has_analysis_summary(file_info):
+        summary = read_analysis_summary(f, file_id)
+        if summary is not None:
+            file_info = {**file_info, **summary}
+    return file_index_row(file_id, file_info)
+
+def open_file_index_table(f):
+    """Return the file index table of an open database, converting older layouts first.
+    
+    Legacy JSON indices and tables without the analysis summary columns are rewritten
+    as a current table, summarising the stored results of already analysed files.
+    """
+    metadata_group = f['metadata']
+    if 'file_index_table' in metadata_group:
+        ds = metadata_group['file_index_table']
+        if ds.dtype == FILE_INDEX_DTYPE:
+            return ds
+        legacy_index = read_file_index(metadata_group)
+        del metadata_group['file_index_table']
+    else:
+        legacy_index = read_file_index(metadata_group)
+        for file_id, file_info in legacy_index.items():
+            _store_file_index_extras(f, file_id, file_info)
+    
+    ds = create_file_index_table(metadata_group)
+    if legacy_index:
+        ds.resize((len(legacy_index),))
+        ds[:] = np.array([_new_file_index_row(f, file_id, file_info) for file_id, file_info in legacy_index.items()],
+                         dtype=FILE_INDEX_DTYPE)
+    if 'file_index' in metadata_group:
+        del metadata_group['file_index']
+    logger.info(f"Converted file index with {len(legacy_index)} entries to the current table layout")
+    return ds
+
+def read_file_index_entry(metadata_group, file_id):
+    """Return the file_info of one file, or None if it is not indexed."""
+    if 'file_index_table' not in metadata_group:
+        return read_file_index(metadata_group).get(file_id)
+    ds = metadata_group['file_index_table']
+    index = _file_index_positions(ds).get(file_id)
+    if index is None:
+        return None
+    return file_index_info(ds[index])
+
+def write_file_index_entries(f, entries):
+    """Merge {file_id: file_info} entries into the file index of an open database.
+    
+    Existing rows are updated in place and new rows are appended with a single write.
+    Keys without a table column (renamed_at, merged_from, ...) are stored as attributes
+    of the file's group. Returns the file_info now stored for each written entry.
+    """
+    ds = open_file_index_table(f)
+    positions = _file_index_positions(ds)
+    
+    written = {}
+    new_rows = []
+    for file_id, file_info in entries.items():
+        _store_file_index_extras(f, file_id, file_info)
+        if file_id in positions:
+            # If file_id exists, merge with existing info instead of replacing
+            index = positions[file_id]
+            row = file_index_row(file_id, file_info, ds[index])
+            ds[index] = row
+        else:
+            row = _new_file_index_row(f, file_id, file_info)
+            new_rows.append(row)
+        written[file_id] = file_index_info(row[()])
+    
+    _append_file_index_rows(ds, new_rows)
+    return written
+
+def append_file_index_entries(f, entries):
+    """Append {file_id: file_info} entries of files that are not in the file index yet.
+    
+    Unlike write_file_index_entries the existing rows are not looked up, so a large index
+    can be built up in batches without rereading its ID column for every batch.
+    """
+    ds = open_file_index_table(f)
+    rows = []
+    for file_id, file_info in entries.items():
+        _store_file_index_extras(f, file_id, file_info)
+        rows.append(_new_file_index_row(f, file_id, file_info))
+    _append_file_index_rows(ds, rows)
+
+def _append_file_index_rows(ds, rows):
+    """Append rows to the file index table with a single write."""
+    if rows:
+        start = ds.shape[0]
+        ds.resize((start + len(rows),))
+        ds[start:] = np.array(rows, dtype=FILE_INDEX_DTYPE)
+
+def remove_file_index_entry(f, file_id):
+    """Remove one file from the file index, keeping the order of the other rows."""
+    ds = open_file_index_table(f)
+    index = _file_index_positions(ds).get(file_id)
+    if index is None:
+        return False
+    if index < ds.shape[0] - 1:
+        ds[index:-1] = ds[index + 1:]
+    ds.resize((ds.shape[0] - 1,))
+    return True
+
+# Raw datasets are compressed with explicit chunks instead of h5py's small automatic ones.
+# Blosc compresses on several threads: LZ4 with bit shuffling suits the sparse photon
+# stream, Zstd the images. Without hdf5plugin both fall back to gzip with byte shuffling.
+# Photon data is chunked in about 1 MiB pieces so parts of it can be read on their own.
+if HDF5PLUGIN_AVAILABLE:
+    IMAGE_COMPRESSION = dict(hdf5plugin.Blosc(cname='zstd', clevel=3, shuffle=hdf5plugin.Blosc.SHUFFLE))
+    PHOTON_DATA_COMPRESSION = dict(hdf5plugin.Blosc(cname='lz4', clevel=5, shuffle=hdf5plugin.Blosc.BITSHUFFLE))
+else:
+    IMAGE_COMPRESSION = {'compression': 'gzip', 'compression_opts': 6, 'shuffle': True}
+    PHOTON_DATA_COMPRESSION = IMAGE_COMPRESSION
+PHOTON_DATA_CHUNK_BYTES = 1024 * 1024
+
+def compressed_chunks(values, chunk_bytes=None):
+    """Return the chunk shape for a compressed dataset holding values.
+
+    Without chunk_bytes the whole array is one chunk; otherwise 1-D data is split into chunks
+    of about chunk_bytes. Empty arrays get h5py's automatic chunking.
+    """
+    if values.size == 0:
+        return True
+    if chunk_bytes is None or values.ndim != 1:
+        return values.shape
+    return (min(len(values), max(1, chunk_bytes // values.itemsize)),)
+
+# Attribute values containing a path separator and a dot are taken for file paths when
+# repairing the index; one regex pass instead of three substring scans
+PATH_LIKE_RE = re.compile(r'[/\\].*\.|\..*[/\\]', re.DOTALL)
+
+# File type recorded in the index for each data file extension
+EXTENSION_FILE_TYPES = {'.flz': 'flz', '.fld': 'flz', '.flr': 'flr', '.flb': 'flb'}
+
+# Datasets of a file's raw_data group; absent ones are recorded as has_<key> = False attributes
+RAW_DATA_KEYS = ('alignment_image', 'laser_on_image', 'photon_data')
+
+def read_raw_dataset(dataset, out=None):
+    """Read one raw_data dataset, dispatching on its dtype instead of guessing.
+    
+    Numeric datasets are image or photon arrays, read with read_direct into a new array;
+    1-D uint8 photon data can be read into out instead. String datasets come from older
+    databases: "null" marks a missing part, anything else is the original file's bytes.
+    """
+    if dataset.dtype.kind in 'SO':
+        data = dataset[()]
+        return None if data == b'null' else data
+    if not dataset.size:
+        return dataset[()]
+    if out is not None and dataset.dtype == np.uint8 and dataset.ndim == 1:
+        dataset.read_direct(out, dest_sel=np.s_[:dataset.size])
+        return out[:dataset.size]
+    values = np.empty(dataset.shape, dtype=dataset.dtype)
+    dataset.read_direct(values)
+    return values
+
+# Sections of the dict returned by get_file_data
+FILE_DATA_SECTIONS = ('metadata', 'raw_data', 'analysis_results', 'photon_analysis')
+
+def write_photon_data(raw_group, source):
+    """Write raw photon data into a resizable, compressed photon_data dataset.
+    
+    source is either the file's bytes, written as they are, or a binary file object, which
+    is copied one chunk at a time through a reused buffer so the file is never held in
+    memory as a whole.
+    """
+    if not hasattr(source, 'readinto'):
+        values = np.frombuffer(source, dtype=np.uint8)
+        return raw_group.create_dataset('photon_data', data=values, maxshape=(None,),
+                                        chunks=(min(PHOTON_DATA_CHUNK_BYTES, max(len(values), 1)),),
+                                        **PHOTON_DATA_COMPRESSION)
+    
+    # The dataset is created at the file's size; small files get a chunk of their own size
+    # so no unused chunk space is allocated
+    size = os.fstat(source.fileno()).st_size
+    ds = raw_group.create_dataset('photon_data', shape=(size,), maxshape=(None,), dtype='u1',
+                                  chunks=(min(PHOTON_DATA_CHUNK_BYTES, max(size, 1)),),
+                                  **PHOTON_DATA_COMPRESSION)
+    buf = np.empty(ds.chunks[0], dtype=np.uint8)
+    offset = 0
+    while True:
+        n = source.readinto(buf)
+        if not n:
+            break
+        if offset + n > ds.shape[0]:
+            # The file grew while it was being copied
+            ds.resize((offset + n,))
+        ds.write_direct(buf, np.s_[:n], np.s_[offset:offset + n])
+        offset += n
+    if offset != ds.shape[0]:
+        ds.resize((offset,))
+    return ds
+
+def read_zip_member_array(zip_file, name):
+    """Inflate a ZIP member straight into a preallocated uint8 array.
+    
+    The member is read in PHOTON_DATA_CHUNK_BYTES pieces, so no bytes object the size
+    of the whole member is created next to the array.
+    """
+    info = zip_file.getinfo(name)
+    with zip_file.open(info) as src:
+        return read_stream_array(src, info.file_size)
+
+def read_stream_array(src, size):
+    """Read up to size bytes from an open binary stream into a new uint8 array."""
+    values = np.empty(size, dtype=np.uint8)
+    view = memoryview(values)
+    offset = 0
+    while offset < size:
+        n = src.readinto(view[offset:offset + PHOTON_DATA_CHUNK_BYTES])
+        if not n:
+            break
+        offset += n
+    return values[:offset]
+
+def copy_database_file(src_path, dst_path):
+    """Copy a database file and its metadata, letting the kernel move the data where possible.
+
+    Tries copy_file_range (which can share extents on btrfs/XFS), then sendfile,
+    then falls back to a buffered copy for whatever is left.
+    """
+    if os.path.isdir(dst_path):
+        dst_path = os.path.join(dst_path, os.path.basename(src_path))
+    
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        src_fd, dst_fd = src.fileno(), dst.fileno()
+        if fcntl is not None and hasattr(os, 'O_NOATIME'):
+            try:
+                # Avoid access-time writes on the source (only permitted for the file owner)
+                fcntl.fcntl(src_fd, fcntl.F_SETFL, fcntl.fcntl(src_fd, fcntl.F_GETFL) | os.O_NOATIME)
+            except OSError:
+                pass
+        
+        size = os.fstat(src_fd).st_size
+        offset = 0
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while offset < size:
+                    copied = os.copy_file_range(src_fd, dst_fd, size - offset, offset, offset)
+                    if copied == 0:
+                        break
+                    offset += copied
+            except OSError:
+                pass
+        if offset < size and hasattr(os, 'sendfile'):
+            try:
+                os.lseek(dst_fd, offset, os.SEEK_SET)
+                while offset < size:
+                    sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+            except OSError:
+                pass
+        if offset < size:
+            src.seek(offset)
+            dst.seek(offset)
+            shutil.copyfileobj(src, dst, length=1 << 20)
+    
+    shutil.copystat(src_path, dst_path)
+    return dst_path
+
+# Temporary group merge_databases copies the other database's files into
+MERGE_STAGING_GROUP = '_merge_staging'
+
+def database_free_fraction(db_path):
+    """Fraction of a database file left unused by deleted or rewritten objects.
+    
+    HDF5 only tracks free space across sessions for files created with fs_persist
+    (all paged databases); for older files this is 0.
+    """
+    size = os.path.getsize(db_path)
+    if not size:
+        return 0.0
+    with h5py.File(db_path, 'r', **h5_open_options('r')) as f:
+        return f.id.get_freespace() / size
+
+def compact_database_file(db_path):
+    """Rewrite a database into a fresh file, dropping the space of deleted objects.
+    
+    HDF5 never shrinks a file when objects are deleted, so databases that see many edits
+    keep growing. Like h5repack, every object is copied (chunks stay compressed) into a
+    new paged file, which then replaces the original. Returns the number of bytes saved.
+    """
+    tmp_path = db_path + '.compact'
+    before = os.path.getsize(db_path)
+    try:
+        with h5py.File(db_path, 'r', **h5_open_options('r')) as src, \
+             h5py.File(tmp_path, 'w', **h5_open_options('w')) as dst:
+            for key, value in src.attrs.items():
+                dst.attrs[key] = value
+            for name in src:
+                src.copy(src[name], dst, name=name)
+        shutil.copystat(db_path, tmp_path)
+        os.replace(tmp_path, db_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return before - os.path.getsize(db_path)
 
 class DataManager:
     """
@@ -48,7 +774,7 @@ class DataManager:
     /
     ├── metadata/
     │   ├── db_info          # Database metadata
-    │   └── file_index       # Index of all files in database
+    │   └── file_index_table # Index of all files in database (one row per file)
     └── files/
         └── {unique_id}/     # Unique folder for each file
             ├── metadata/    # File metadata (from metadata.json)
@@ -65,6 +791,33 @@ class DataManager:
     def __init__(self, log_file=None, log_level=logging.INFO):
         self.db_path = None
         self.db_file = None
+        self.legacy_data = None
+        
+        # Query results are cached until the database is written to or changes on disk
+        self._db_version = 0
+        self._cache_token = None
+        self._cache_version = 0
+        self._files_cache = None
+        self._file_data_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        # realpath -> (mtime_ns, size) of recently opened databases that passed the structure check
+        self._opened_dbs = OrderedDict()
+        
+        # Long-lived read-only handle on the current database; writes reopen it for writing
+        # and close it again when the outermost write block ends
+        self._h5 = None
+        self._h5_lock = threading.RLock()
+        self._h5_users = 0
+        
+        # Set while a batch_writes block runs: the write handle used for the whole batch
+        self._bulk_db = None
+        
+        # File index updates queued by a batch_writes block; flush_index writes them at once
+        self._pending_index = {}
+        
+        # Parsed file index of the current database, kept in step with our own index writes
+        self._file_index = None
         
         # Configure logging for this instance
         self._setup_logging(log_file, log_level)
@@ -103,7 +856,7 @@ class DataManager:
         """
         global logger
         logger.setLevel(level)
-        for handler in logger.handlers:
+        for handler in logger.handlers + list(log_listener.handlers):
             handler.setLevel(level)
         logger.info(f"Logging level changed to: {logging.getLevelName(level)}")
     
@@ -126,8 +879,8 @@ class DataManager:
                 datefmt='%Y-%m-%d %H:%M:%S'
             )
         
-        # Update all handlers
-        for handler in logger.handlers:
+        # Update all handlers (the queue handler must keep passing records through unformatted)
+        for handler in _output_handlers():
             handler.setFormatter(formatter)
         
         format_type = "simple" if simple else "detailed"
@@ -136,7 +889,6 @@ class DataManager:
     def _initialize_default_database(self):
         """Initialize a default database if none exists."""
         try:
-            import os
             # Create default database in the current directory
             default_db_path = os.path.join(os.getcwd(), 'flx_data.fldb')
             
@@ -155,15 +907,17 @@ class DataManager:
         
     def create_database(self, db_path):
         """Create a new FLDB database."""
-        logger.debug(f"Creating database at: {db_path}")
+        logger.debug("Creating database at: %s", db_path)
         try:
+            self._release_cached_data()
             self.db_path = db_path
             if not db_path.endswith('.fldb'):
                 db_path += '.fldb'
-                logger.debug(f"Added .fldb extension: {db_path}")
+                logger.debug("Added .fldb extension: %s", db_path)
                 
             logger.debug("Initializing HDF5 file structure")
-            with h5py.File(db_path, 'w') as f:
+            self._invalidate_cache()
+            with self._open_db('w', db_path) as f:
                 # Create main structure
                 metadata_group = f.create_group('metadata')
                 files_group = f.create_group('files')
@@ -175,11 +929,11 @@ class DataManager:
                     'version': '1.0',
                     'description': 'FLX Data Analyzer Database'
                 }
-                metadata_group.create_dataset('db_info', data=json.dumps(db_info))
+                metadata_group.create_dataset('db_info', data=_json_dumps(db_info))
                 logger.debug("Added database metadata")
                 
                 # File index (will store list of file IDs and their info)
-                metadata_group.create_dataset('file_index', data=json.dumps({}))
+                create_file_index_table(metadata_group)
                 logger.debug("Initialized empty file index")
                 
             logger.info(f"Successfully created FLDB database: {db_path}")
@@ -191,25 +945,48 @@ class DataManager:
     
     def open_database(self, db_path):
         """Open an existing FLDB database."""
-        logger.debug(f"Attempting to open database: {db_path}")
+        logger.debug("Attempting to open database: %s", db_path)
         try:
             if not os.path.exists(db_path):
                 logger.error(f"Database file not found: {db_path}")
                 return False
                 
-            logger.debug("File exists, checking structure")
+            self._release_cached_data()
             self.db_path = db_path
+            
+            # A recently opened database that has not changed since needs no second check
+            real_path = os.path.realpath(db_path)
+            stat = os.stat(real_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            with self._cache_lock:
+                if self._opened_dbs.get(real_path) == signature:
+                    self._opened_dbs.move_to_end(real_path)
+                    logger.info(f"Reopened FLDB database: {db_path}")
+                    return True
+            
+            logger.debug("File exists, checking structure")
             # Test opening the file
-            with h5py.File(db_path, 'r') as f:
+            with self._open_db('r', db_path) as f:
                 if 'metadata' not in f or 'files' not in f:
                     logger.error("Invalid FLDB file structure - missing required groups")
                     return False
                 
                 # Log database info if available
                 if 'db_info' in f['metadata']:
-                    db_info = json.loads(f['metadata']['db_info'][()])
-                    logger.debug(f"Database version: {db_info.get('version', 'unknown')}")
-                    logger.debug(f"Created: {db_info.get('created', 'unknown')}")
+                    db_info = _json_loads(f['metadata']['db_info'][()])
+                    logger.debug("Database version: %s", db_info.get('version', 'unknown'))
+                    logger.debug("Created: %s", db_info.get('created', 'unknown'))
+            
+            # Index entries or file groups left incomplete by an interrupted write
+            if self._attempt_metadata_repair():
+                stat = os.stat(real_path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+            
+            with self._cache_lock:
+                self._opened_dbs[real_path] = signature
+                self._opened_dbs.move_to_end(real_path)
+                while len(self._opened_dbs) > OPENED_DB_CACHE_SIZE:
+                    self._opened_dbs.popitem(last=False)
                     
             logger.info(f"Successfully opened FLDB database: {db_path}")
             return True
@@ -218,67 +995,77 @@ class DataManager:
             logger.error(f"Failed to open database '{db_path}': {e}")
             return False
     
-    def add_flz_file(self, flz_path):
-        """Add a FLZ file to the database."""
-        logger.debug(f"Adding FLZ file: {flz_path}")
+    def add_flz_file(self, flz_path, data=None, file_data=None):
+        """Add a FLZ file to the database.
+        
+        data may hold the file's bytes if they were already read (see read_blobs_batched),
+        file_data its already extracted contents (see read_flz_batched).
+        """
+        logger.debug("Adding FLZ file: %s", flz_path)
         try:
             if not self.db_path:
                 logger.error("Cannot add file: No database is currently opened")
                 return None
                 
-            if not os.path.exists(flz_path):
+            if data is None and file_data is None and not os.path.exists(flz_path):
                 logger.error(f"FLZ file not found: {flz_path}")
                 return None
                 
             unique_id = str(uuid.uuid4())
-            logger.debug(f"Generated unique ID for file: {unique_id}")
+            logger.debug("Generated unique ID for file: %s", unique_id)
             
-            logger.debug("Extracting FLZ file contents")
-            with zipfile.ZipFile(flz_path, 'r') as zip_file:
-                # Extract file contents
-                file_data = self._extract_flz_contents(zip_file)
+            if file_data is None:
+                logger.debug("Extracting FLZ file contents")
+                with zipfile.ZipFile(io.BytesIO(data) if data is not None else flz_path, 'r') as zip_file:
+                    # Extract file contents
+                    file_data = self._extract_flz_contents(zip_file, workers=FLZ_MEMBER_WORKERS)
                 
-            logger.debug(f"Extracted data - Images: {file_data['alignment_image'] is not None}, "
-                        f"{file_data['laser_on_image'] is not None}, "
-                        f"Photon data: {file_data['photon_data'] is not None}")
+            logger.debug("Extracted data - Images: %s, %s, Photon data: %s",
+                         file_data['alignment_image'] is not None,
+                         file_data['laser_on_image'] is not None,
+                         file_data['photon_data'] is not None)
                 
             # Add to database
-            with h5py.File(self.db_path, 'a') as f:
+            self._invalidate_cache(unique_id)
+            with self._open_db('a') as f:
                 file_group = f['files'].create_group(unique_id)
                 
                 # Store metadata
                 metadata_group = file_group.create_group('metadata')
                 if file_data['metadata']:
-                    metadata_group.create_dataset('file_metadata', data=json.dumps(file_data['metadata']))
+                    metadata_group.create_dataset('file_metadata', data=_json_dumps(file_data['metadata']))
                 
                 # Store raw data
                 raw_group = file_group.create_group('raw_data')
                 
-                # Store images
+                # Store images (each image is read whole, so it is stored as a single chunk)
                 if file_data['alignment_image'] is not None:
                     raw_group.create_dataset('alignment_image', data=file_data['alignment_image'],
-                                            compression='gzip', compression_opts=6)
+                                            chunks=compressed_chunks(file_data['alignment_image']),
+                                            **IMAGE_COMPRESSION)
                 else:
-                    raw_group.create_dataset('alignment_image', data=json.dumps(None))
+                    raw_group.attrs['has_alignment_image'] = False
                     
                 if file_data['laser_on_image'] is not None:
                     raw_group.create_dataset('laser_on_image', data=file_data['laser_on_image'],
-                                            compression='gzip', compression_opts=6)
+                                            chunks=compressed_chunks(file_data['laser_on_image']),
+                                            **IMAGE_COMPRESSION)
                 else:
-                    raw_group.create_dataset('laser_on_image', data=json.dumps(None))
+                    raw_group.attrs['has_laser_on_image'] = False
                 
                 # Store photon data
                 if file_data['photon_data'] is not None:
-                    raw_group.create_dataset('photon_data', data=file_data['photon_data'], 
-                                            compression='gzip', compression_opts=6)
+                    raw_group.create_dataset('photon_data', data=file_data['photon_data'],
+                                            chunks=compressed_chunks(file_data['photon_data'], PHOTON_DATA_CHUNK_BYTES),
+                                            **PHOTON_DATA_COMPRESSION)
                 else:
-                    raw_group.create_dataset('photon_data', data=json.dumps(None))
+                    raw_group.attrs['has_photon_data'] = False
                 
                 # Create empty analysis group
                 file_group.create_group('analysis')
                 
                 # Update file index
-                self._update_file_index(unique_id, {
+                self._update_file_index(unique_id, f, {
                     'original_path': flz_path,
                     'file_type': 'flz',
                     'added': datetime.now().isoformat(),
@@ -297,7 +1084,7 @@ class DataManager:
             logger.error(f"Failed to add FLZ file '{flz_path}': {e}")
             return None
     
-    def add_flr_file(self, flr_path):
+    def add_flr_file(self, flr_path, data=None):
         """Add a FLR file to the database (raw photon data only)."""
         try:
             if not self.db_path:
@@ -306,12 +1093,12 @@ class DataManager:
                 
             unique_id = str(uuid.uuid4())
             
-            # Load FLR data (assuming it's binary photon data)
-            with open(flr_path, 'rb') as f:
-                photon_data = np.frombuffer(f.read(), dtype=np.uint8)
+            # Open the source first so a missing file fails before anything is written
+            source = open(flr_path, 'rb') if data is None else contextlib.nullcontext(data)
             
             # Add to database with template structure
-            with h5py.File(self.db_path, 'a') as f:
+            self._invalidate_cache(unique_id)
+            with source as src, self._open_db('a') as f:
                 file_group = f['files'].create_group(unique_id)
                 
                 # Store minimal metadata
@@ -321,19 +1108,20 @@ class DataManager:
                     'file_type': 'flr',
                     'imported': datetime.now().isoformat()
                 }
-                metadata_group.create_dataset('file_metadata', data=json.dumps(file_metadata))
+                metadata_group.create_dataset('file_metadata', data=_json_dumps(file_metadata))
                 
                 # Store raw data with template structure
                 raw_group = file_group.create_group('raw_data')
-                raw_group.create_dataset('alignment_image', data=json.dumps(None))  # No image data
-                raw_group.create_dataset('laser_on_image', data=json.dumps(None))   # No image data
-                raw_group.create_dataset('photon_data', data=photon_data)
+                raw_group.attrs['has_alignment_image'] = False  # No image data
+                raw_group.attrs['has_laser_on_image'] = False
+                # FLR data (assuming it's binary photon data) is streamed from disk unless already read
+                write_photon_data(raw_group, src)
                 
                 # Create empty analysis group
                 file_group.create_group('analysis')
                 
                 # Update file index
-                self._update_file_index(unique_id, {
+                self._update_file_index(unique_id, f, {
                     'original_path': flr_path,
                     'file_type': 'flr',
                     'added': datetime.now().isoformat(),
@@ -349,7 +1137,7 @@ class DataManager:
             logger.error(f"Error adding FLR file: {e}")
             return None
     
-    def add_flb_file(self, flb_path):
+    def add_flb_file(self, flb_path, data=None):
         """Add a FLB file to the database (similar to FLR)."""
         try:
             if not self.db_path:
@@ -358,12 +1146,12 @@ class DataManager:
                 
             unique_id = str(uuid.uuid4())
             
-            # Load FLB data (assuming it's binary data)
-            with open(flb_path, 'rb') as f:
-                raw_data = np.frombuffer(f.read(), dtype=np.uint8)
+            # Open the source first so a missing file fails before anything is written
+            source = open(flb_path, 'rb') if data is None else contextlib.nullcontext(data)
             
             # Add to database with template structure
-            with h5py.File(self.db_path, 'a') as f:
+            self._invalidate_cache(unique_id)
+            with source as src, self._open_db('a') as f:
                 file_group = f['files'].create_group(unique_id)
                 
                 # Store minimal metadata
@@ -373,19 +1161,20 @@ class DataManager:
                     'file_type': 'flb',
                     'imported': datetime.now().isoformat()
                 }
-                metadata_group.create_dataset('file_metadata', data=json.dumps(file_metadata))
+                metadata_group.create_dataset('file_metadata', data=_json_dumps(file_metadata))
                 
                 # Store raw data with template structure
                 raw_group = file_group.create_group('raw_data')
-                raw_group.create_dataset('alignment_image', data=json.dumps(None))  # No image data
-                raw_group.create_dataset('laser_on_image', data=json.dumps(None))   # No image data
-                raw_group.create_dataset('photon_data', data=raw_data)
+                raw_group.attrs['has_alignment_image'] = False  # No image data
+                raw_group.attrs['has_laser_on_image'] = False
+                # FLB data (assuming it's binary data) is streamed from disk unless already read
+                write_photon_data(raw_group, src)
                 
                 # Create empty analysis group
                 file_group.create_group('analysis')
                 
                 # Update file index
-                self._update_file_index(unique_id, {
+                self._update_file_index(unique_id, f, {
                     'original_path': flb_path,
                     'file_type': 'flb',
                     'added': datetime.now().isoformat(),
@@ -401,6 +1190,134 @@ class DataManager:
             logger.error(f"Error adding FLB file: {e}")
             return None
     
+    def add_files(self, paths):
+        """Add several FLZ/FLR/FLB files in one batch.
+        
+        The files are written in one batch_writes block, so the database is opened once
+        and the file index is written once; FLZ files are decoded on worker threads while
+        earlier ones are written.
+        Returns the new file IDs in input order (None for files that failed).
+        """
+        adders = {'.flr': self.add_flr_file, '.flb': self.add_flb_file}
+        paths = list(paths)
+        file_ids = [None] * len(paths)
+        try:
+            if not self.db_path:
+                logger.error("No database opened")
+                return file_ids
+            
+            flz_positions = [i for i, path in enumerate(paths) if os.path.splitext(path)[1].lower() == '.flz']
+            other_positions = [i for i, path in enumerate(paths) if os.path.splitext(path)[1].lower() != '.flz']
+            
+            with self.batch_writes():
+                flz_files = self.read_flz_batched([paths[i] for i in flz_positions])
+                for i, (path, file_data) in zip(flz_positions, flz_files):
+                    if file_data is not None:
+                        file_ids[i] = self.add_flz_file(path, file_data=file_data)
+                
+                blobs = self.read_blobs_batched([paths[i] for i in other_positions])
+                for i, (path, data) in zip(other_positions, blobs):
+                    adder = adders.get(os.path.splitext(path)[1].lower())
+                    if adder is None:
+                        logger.warning(f"Unsupported file type: {path}")
+                        continue
+                    file_ids[i] = adder(path, data=data)
+            
+            logger.info(f"Added {sum(file_id is not None for file_id in file_ids)} of {len(paths)} files")
+            return file_ids
+            
+        except Exception as e:
+            logger.error(f"Error adding files: {e}")
+            return file_ids
+    
+    @contextlib.contextmanager
+    def batch_writes(self):
+        """Keep the current database open for writing across several file additions.
+        
+        Writes in the block are flushed, and the file index is written, once when it ends
+        instead of after every file. A nested block joins the outer one. The block holds
+        _h5_lock, so other threads wait for the batch to end before they access the database.
+        """
+        with self._h5_lock:
+            if self._bulk_db is not None or not self.db_path:
+                yield
+                return
+            with self._open_db('a') as f:
+                self._bulk_db = f
+                try:
+                    yield
+                finally:
+                    self.flush_index()
+                    self._bulk_db = None
+    
+    def read_flz_batched(self, paths, workers=FLZ_DECODE_WORKERS):
+        """Yield (path, file_data) for each FLZ file in order, decoding ahead on worker threads.
+        
+        ZIP inflation and PNG decoding release the GIL, so several files are decoded in
+        parallel while the caller writes earlier ones. file_data is None for files that
+        could not be read or decoded.
+        """
+        def decode(path, data):
+            if data is None:
+                return None
+            try:
+                with zipfile.ZipFile(io.BytesIO(data), 'r') as zip_file:
+                    return self._extract_flz_contents(zip_file)
+            except zipfile.BadZipFile as e:
+                logger.error(f"Invalid ZIP file '{path}': {e}")
+            except Exception as e:
+                logger.error(f"Failed to decode FLZ file '{path}': {e}")
+            return None
+        
+        workers = max(1, workers)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for path, data in self.read_blobs_batched(paths):
+                pending.append((path, pool.submit(decode, path, data)))
+                if len(pending) > workers:
+                    path, future = pending.popleft()
+                    yield path, future.result()
+            while pending:
+                path, future = pending.popleft()
+                yield path, future.result()
+    
+    def read_blobs_batched(self, paths, prefetch=READ_PREFETCH_DEPTH):
+        """Yield (path, bytes) for each path in order, reading ahead on worker threads.
+        
+        On Linux every file is hinted with POSIX_FADV_WILLNEED first so the kernel can
+        queue readahead for the whole batch. Files that cannot be read yield None.
+        """
+        paths = list(paths)
+        if hasattr(os, 'posix_fadvise'):
+            for path in paths:
+                try:
+                    fd = os.open(path, os.O_RDONLY)
+                    try:
+                        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                    finally:
+                        os.close(fd)
+                except OSError:
+                    pass
+        
+        def read_blob(path):
+            try:
+                with open(path, 'rb') as f:
+                    return f.read()
+            except OSError as e:
+                logger.warning(f"Could not read '{path}': {e}")
+                return None
+        
+        prefetch = max(1, prefetch)
+        remaining = iter(paths[prefetch:])
+        with ThreadPoolExecutor(max_workers=prefetch) as pool:
+            pending = deque((path, pool.submit(read_blob, path)) for path in paths[:prefetch])
+            while pending:
+                path, future = pending.popleft()
+                next_path = next(remaining, None)
+                if next_path is not None:
+                    pending.append((next_path, pool.submit(read_blob, next_path)))
+                yield path, future.result()
+    
     def add_analysis_result(self, file_id, analysis_data, analysis_metadata=None):
         """Add analysis results for a specific file."""
         try:
@@ -410,7 +1327,8 @@ class DataManager:
                 
             analysis_id = str(uuid.uuid4())
             
-            with h5py.File(self.db_path, 'a') as f:
+            self._invalidate_cache(file_id)
+            with self._open_db('a') as f:
                 if file_id not in f['files']:
                     logger.error(f"File ID {file_id} not found in database")
                     return None
@@ -419,7 +1337,7 @@ class DataManager:
                 
                 # Store analysis results
                 if isinstance(analysis_data, dict):
-                    analysis_group.create_dataset('results', data=json.dumps(analysis_data))
+                    write_analysis_results(analysis_group, analysis_data)
                 elif isinstance(analysis_data, np.ndarray):
                     analysis_group.create_dataset('results', data=analysis_data)
                 else:
@@ -432,7 +1350,7 @@ class DataManager:
                     'analysis_id': analysis_id,
                     'created': datetime.now().isoformat()
                 })
-                analysis_group.create_dataset('metadata', data=json.dumps(analysis_metadata))
+                analysis_group.create_dataset('metadata', data=_json_dumps(analysis_metadata))
             
             logger.info(f"Added analysis result {analysis_id} for file {file_id}")
             return analysis_id
@@ -448,7 +1366,8 @@ class DataManager:
                 logger.error("No database opened")
                 return False
                 
-            with h5py.File(self.db_path, 'a') as f:
+            self._invalidate_cache(file_id)
+            with self._open_db('a') as f:
                 if file_id not in f['files']:
                     logger.error(f"File ID {file_id} not found in database")
                     return False
@@ -463,7 +1382,7 @@ class DataManager:
                 analysis_group = file_group.create_group('photon_analysis')
                 
                 # Store analysis results
-                analysis_group.create_dataset('results', data=json.dumps(analysis_results))
+                write_analysis_results(analysis_group, analysis_results)
                 
                 # Store metadata
                 metadata = {
@@ -473,10 +1392,10 @@ class DataManager:
                     'flowrate': analysis_results.get('flowrate', 0),
                     'has_peaks': len(analysis_results.get('start_bins', [])) > 0
                 }
-                analysis_group.create_dataset('metadata', data=json.dumps(metadata))
+                analysis_group.create_dataset('metadata', data=_json_dumps(metadata))
                 
-                # Update file index with analysis flag
-                self._update_file_index(file_id, {'has_analysis': True})
+                # Update file index with analysis flag and the summary shown by list_files
+                self._update_file_index(file_id, f, {'has_analysis': True, **analysis_summary(analysis_results)})
             
             logger.info(f"Updated photon analysis for file {file_id}")
             return True
@@ -485,77 +1404,97 @@ class DataManager:
             logger.error(f"Error updating file analysis: {e}")
             return False
     
-    def get_file_data(self, file_id):
-        """Retrieve all data for a specific file."""
+    def get_file_data(self, file_id, load=FILE_DATA_SECTIONS, out=None):
+        """Retrieve the data of a specific file.
+        
+        load selects the sections to read (see FILE_DATA_SECTIONS); the others are left
+        out, except raw_data, which then holds the h5py datasets themselves so large
+        arrays are only read on demand. Those stay valid until the database is written
+        to or closed. out is an optional uint8 buffer the photon data is read into.
+        
+        Complete results are cached per file until the database changes, so the returned
+        data should be treated as read-only.
+        """
+        load = frozenset(load)
+        if not load.issuperset(FILE_DATA_SECTIONS) or out is not None:
+            return self._read_file_data(file_id, load, out)
+        
+        with self._cache_lock:
+            if self._cache_valid() and file_id in self._file_data_cache:
+                self._file_data_cache.move_to_end(file_id)
+                return self._file_data_cache[file_id]
+        
+        file_data = self._read_file_data(file_id, load)
+        if file_data is not None:
+            with self._cache_lock:
+                self._file_data_cache[file_id] = file_data
+                while len(self._file_data_cache) > FILE_DATA_CACHE_SIZE:
+                    self._file_data_cache.popitem(last=False)
+        return file_data
+    
+    def _read_file_data(self, file_id, load, out=None):
         try:
             if not self.db_path:
                 logger.error("No database opened")
                 return None
                 
-            with h5py.File(self.db_path, 'r') as f:
+            with self._open_db('r') as f:
                 if file_id not in f['files']:
                     logger.error(f"File ID {file_id} not found")
                     return None
                 
                 file_group = f['files'][file_id]
+                file_data = {'file_id': file_id}
                 
                 # Get metadata
-                metadata = None
-                if 'file_metadata' in file_group['metadata']:
-                    metadata = json.loads(file_group['metadata']['file_metadata'][()])
-                
-                # Get raw data
-                raw_data = {}
-                for key in file_group['raw_data'].keys():
-                    data = file_group['raw_data'][key][()]
-                    if isinstance(data, bytes):
-                        try:
-                            # Try to decode as JSON first
-                            decoded = data.decode('utf-8')
-                            if decoded == 'null':
-                                raw_data[key] = None
-                            else:
-                                raw_data[key] = json.loads(decoded)
-                        except (UnicodeDecodeError, json.JSONDecodeError):
-                            # If it's not JSON, it might be binary image data
-                            raw_data[key] = data
+                if 'metadata' in load:
+                    metadata = None
+                    if 'file_metadata' in file_group['metadata']:
+                        metadata = _json_loads(file_group['metadata']['file_metadata'][()])
+                    file_data['metadata'] = metadata
+                
+                # Get raw data; missing parts are flagged with has_* attributes instead of datasets
+                raw_group = file_group['raw_data']
+                raw_data = {key: None for key in RAW_DATA_KEYS if not raw_group.attrs.get(f'has_{key}', True)}
+                for key in raw_group.keys():
+                    dataset = raw_group[key]
+                    if 'raw_data' not in load:
+                        raw_data[key] = dataset
                     else:
-                        raw_data[key] = data
+                        raw_data[key] = read_raw_dataset(dataset, out if key == 'photon_data' else None)
+                file_data['raw_data'] = raw_data
                 
                 # Get analysis results (legacy format)
-                analysis_results = {}
-                for analysis_id in file_group['analysis'].keys():
-                    analysis_group = file_group['analysis'][analysis_id]
-                    analysis_results[analysis_id] = {
-                        'results': analysis_group['results'][()],
-                        'metadata': json.loads(analysis_group['metadata'][()])
-                    }
+                if 'analysis_results' in load:
+                    analysis_results = {}
+                    for analysis_id in file_group['analysis'].keys():
+                        analysis_group = file_group['analysis'][analysis_id]
+                        results_dataset = analysis_group['results']
+                        analysis_results[analysis_id] = {
+                            'results': (read_analysis_results(results_dataset)
+                                        if is_packed_analysis_results(results_dataset) else results_dataset[()]),
+                            'metadata': _json_loads(analysis_group['metadata'][()])
+                        }
+                    file_data['analysis_results'] = analysis_results
                 
                 # Get photon analysis results (new format)
-                photon_analysis = None
-                if 'photon_analysis' in file_group:
-                    photon_group = file_group['photon_analysis']
-                    photon_analysis = {}
-                    
-                    if 'results' in photon_group:
-                        results_data = photon_group['results'][()]
-                        if isinstance(results_data, bytes):
-                            results_data = results_data.decode('utf-8')
-                        photon_analysis['results'] = results_data
-                    
-                    if 'metadata' in photon_group:
-                        metadata_data = photon_group['metadata'][()]
-                        if isinstance(metadata_data, bytes):
-                            metadata_data = metadata_data.decode('utf-8')
-                        photon_analysis['metadata'] = json.loads(metadata_data)
-                
-                return {
-                    'file_id': file_id,
-                    'metadata': metadata,
-                    'raw_data': raw_data,
-                    'analysis_results': analysis_results,
-                    'photon_analysis': photon_analysis
-                }
+                if 'photon_analysis' in load:
+                    photon_analysis = None
+                    if 'photon_analysis' in file_group:
+                        photon_group = file_group['photon_analysis']
+                        photon_analysis = {}
+                        
+                        if 'results' in photon_group:
+                            photon_analysis['results'] = read_analysis_results(photon_group['results'])
+                        
+                        if 'metadata' in photon_group:
+                            metadata_data = photon_group['metadata'][()]
+                            if isinstance(metadata_data, bytes):
+                                metadata_data = metadata_data.decode('utf-8')
+                            photon_analysis['metadata'] = _json_loads(metadata_data)
+                    file_data['photon_analysis'] = photon_analysis
+                
+                return file_data
                 
         except Exception as e:
             logger.error(f"Error getting file data: {e}")
@@ -563,207 +1502,259 @@ class DataManager:
     
     def list_files(self):
         """List all files in the database and return as DataFrame with analysis results."""
-        columns = ["File ID", "File Name", "File Type", "Peak Count", "Signal CV", "Avg Background", "Avg Fluorescence", "Transit Time", "Eff. Rec. Time"]
+        self.flush_index()
+        with self._cache_lock:
+            if self._cache_valid() and self._files_cache is not None:
+                return self._files_cache.copy()
+        
+        files_df = self._query_files()
+        with self._cache_lock:
+            self._files_cache = files_df
+        return files_df.copy()
+    
+    def _query_files(self):
+        columns = FILE_LIST_COLUMNS
         try:
             if not self.db_path:
                 logger.error("No database opened")
                 return pd.DataFrame(columns=columns)
                 
-            with h5py.File(self.db_path, 'r') as f:
-                file_index = json.loads(f['metadata']['file_index'][()])
+            with self._open_db('r') as f:
+                file_index = self._get_file_index(f)
                 
                 if not file_index:
                     # Return empty DataFrame with proper columns
                     return pd.DataFrame(columns=columns)
                 
-                # Convert file_index dictionary to DataFrame
-                records = []
-                for file_id, file_info in file_index.items():
-                    # Debug: print file_info structure for problematic entries
-                    if not file_info.get('original_path') or file_info.get('original_path') == 'Unknown':
-                        logger.debug(f"File {file_id} has problematic file_info: {file_info}")
-                    
-                    # Extract filename from original_path with fallbacks
-                    original_path = file_info.get('original_path', 'Unknown')
-                    
-                    # Try multiple fallback sources for filename
-                    if original_path == 'Unknown' or not original_path:
-                        # Try to get filename from file_name field
-                        file_name = file_info.get('file_name', 'Unknown')
-                        if file_name == 'Unknown':
-                            # Try other possible field names
-                            file_name = file_info.get('name', f"File_{file_id}")
-                            if file_name == f"File_{file_id}":
-                                # Try to extract from any path-like field
-                                for field in file_info.values():
-                                    if isinstance(field, str) and ('/' in field or '\\' in field):
-                                        potential_name = os.path.basename(field)
-                                        if potential_name and potential_name != field:
-                                            file_name = potential_name
-                                            original_path = field
-                                            break
-                    else:
-                        file_name = os.path.basename(original_path)
-                    
-                    # Initialize analysis columns with default values
-                    peak_count = "N/A"
-                    signal_cv = "N/A"
-                    avg_background = "N/A"
-                    avg_fluorescence = "N/A"
-                    transit_time = "N/A"
-                    eff_rec_time = "N/A"
-                    
-                    # Try to get analysis results for this file
-                    try:
-                        if f'files/{file_id}/photon_analysis' in f:
-                            analysis_group = f[f'files/{file_id}/photon_analysis']
-                            if 'results' in analysis_group:
-                                results_data = analysis_group['results'][()]
-                                if isinstance(results_data, bytes):
-                                    results_data = results_data.decode('utf-8')
-                                
-                                analysis_results = json.loads(results_data)
-                                peak_count = analysis_results.get('total_peak_count', 0)
-                                signal_cv = f"{analysis_results.get('signal_cv', 0):.2f}"
-                                avg_background = f"{analysis_results.get('avg_background', 0):.1f}"
-                                avg_fluorescence = f"{analysis_results.get('avg_fl_signal', 0):.1f}"
-                                transit_time = f"{analysis_results.get('avg_particle_transit_time', 0):.2f}"
-                                eff_rec_time = f"{analysis_results.get('effective_recording_time', 0):.2f}"
-                    except Exception as e:
-                        logger.debug(f"No analysis results for file {file_id}: {e}")
-                    
-                    # Handle file type with fallbacks
-                    file_type = file_info.get('file_type', 'Unknown')
-                    if file_type == 'Unknown' and original_path != 'Unknown':
-                        # Try to infer from extension
-                        ext = os.path.splitext(original_path)[1].lower()
-                        if ext in ['.flz', '.fld']:
-                            file_type = 'flz'
-                        elif ext in ['.flr']:
-                            file_type = 'flr'
-                        elif ext in ['.flb']:
-                            file_type = 'flb'
-                    
-                    record = {
-                        "File ID": file_id,
-                        "File Name": file_name,
-                        "File Type": file_type,
-                        # "File Path": original_path,
-                        "Peak Count": peak_count,
-                        "Signal CV": signal_cv,
-                        "Avg Background": avg_background,
-                        "Avg Fluorescence": avg_fluorescence,
-                        "Transit Time": transit_time,
-                        "Eff. Rec. Time": eff_rec_time
-                    }
-                    records.append(record)
-                
-                df = pd.DataFrame(records)
-                
-                # Check if we have any entries with missing metadata and attempt repair
-                unknown_count = len(df[df['File Name'] == 'Unknown'])
-                if unknown_count > 0:
-                    logger.warning(f"Found {unknown_count} entries with missing metadata, attempting repair...")
-                    self._attempt_metadata_repair()
-                    # Re-read the data after repair
-                    return self.list_files()
-                
-                logger.debug(f"Retrieved {len(df)} files from database with analysis data")
-                return df
+                # Fill one preallocated array per column instead of building a dict per row
+                file_ids = list(file_index)
+                columns = file_list_columns(list(file_index.values()))
+                # Indices without the analysis summary need the stored results; find them all at once
+                analysed = None
+                if not all(has_analysis_summary(file_info) for file_info in file_index.values()):
+                    analysed = analysed_file_ids(f)
+                for i, file_id in enumerate(file_ids):
+                    self._file_record(f, file_id, file_index[file_id], columns, i, analysed)
+                
+                # Repair entries with missing metadata in memory, reading only their own groups
+                repaired = {}
+                for i in np.flatnonzero(columns['File Name'] == 'Unknown'):
+                    file_id = file_ids[i]
+                    file_info = dict(file_index[file_id])
+                    if self._repair_index_entry(f, file_id, file_info):
+                        repaired[file_id] = file_info
+                        self._file_record(f, file_id, file_info, columns, i, analysed)
+                
+                df = file_list_frame(columns)
+                if logger.isEnabledFor(logging.DEBUG):
+                    # Reading the hit rate is an HDF5 call, so only do it when it is logged
+                    logger.debug("Retrieved %d files from database with analysis data "
+                                 "(metadata cache hit rate %.2f)", len(df), f.id.get_mdc_hit_rate())
+            
+            # Save all repaired entries with a single index update
+            if repaired:
+                logger.warning(f"Found {len(repaired)} entries with missing metadata, saving repaired entries")
+                self._invalidate_cache()
+                with self._open_db('a') as f:
+                    self._write_index_entries(f, repaired)
+            
+            return df
                 
         except Exception as e:
             logger.error(f"Error listing files: {e}")
             # return pd.DataFrame(columns=["File ID", "File Name", "File Type", "File Path", "Peak Count", "Avg Background", "Transit Time"])
             return pd.DataFrame(columns=columns)
     
+    def get_file_record(self, file_id):
+        """Return the list_files row for a single file as a one-row DataFrame."""
+        self.flush_index()
+        try:
+            if not self.db_path:
+                logger.error("No database opened")
+                return None
+            
+            with self._open_db('r') as f:
+                file_info = self._get_file_index(f).get(file_id)
+                if file_info is None:
+                    logger.error(f"File ID {file_id} not found in file index")
+                    return None
+                columns = file_list_columns([file_info])
+                self._file_record(f, file_id, file_info, columns, 0)
+                return file_list_frame(columns)
+                
+        except Exception as e:
+            logger.error(f"Error getting file record: {e}")
+            return None
+    
+    def _file_record(self, f, file_id, file_info, columns, i, analysed=None):
+        """Fill row i of the list_files column arrays for one file index entry.
+        
+        analysed is passed on to read_analysis_summary for indices without the summary columns.
+        """
+        # Debug: print file_info structure for problematic entries
+        if not file_info.get('original_path') or file_info.get('original_path') == 'Unknown':
+            logger.debug("File %s has problematic file_info: %s", file_id, file_info)
+        
+        # Extract filename from original_path with fallbacks
+        original_path = file_info.get('original_path', 'Unknown')
+        
+        # Try multiple fallback sources for filename
+        if original_path == 'Unknown' or not original_path:
+            # Try to get filename from file_name field
+            file_name = file_info.get('file_name', 'Unknown')
+            if file_name == 'Unknown':
+                # Try other possible field names
+                file_name = file_info.get('name', f"File_{file_id}")
+                if file_name == f"File_{file_id}":
+                    # Try to extract from any path-like field
+                    for field in file_info.values():
+                        if isinstance(field, str) and ('/' in field or '\\' in field):
+                            potential_name = os.path.basename(field)
+                            if potential_name and potential_name != field:
+                                file_name = potential_name
+                                original_path = field
+                                break
+        else:
+            file_name = os.path.basename(original_path)
+        
+        # The analysis columns are already filled from the index summary; older indices
+        # without it fall back to decoding the stored results (NaN for files without any)
+        if not has_analysis_summary(file_info):
+            try:
+                summary = read_analysis_summary(f, file_id, analysed) or {}
+            except Exception as e:
+                logger.debug("No analysis results for file %s: %s", file_id, e)
+                summary = {}
+            for col, name in FILE_LIST_SUMMARY_FIELDS.items():
+                columns[col][i] = summary.get(name, np.nan)
+        
+        # Handle file type with fallbacks
+        file_type = file_info.get('file_type', 'Unknown')
+        if file_type == 'Unknown' and original_path != 'Unknown':
+            # Try to infer from extension
+            ext = os.path.splitext(original_path)[1].lower()
+            file_type = EXTENSION_FILE_TYPES.get(ext, file_type)
+        
+        columns["File ID"][i] = file_id
+        columns["File Name"][i] = file_name
+        columns["File Type"][i] = file_type
+    
     def _attempt_metadata_repair(self):
-        """Attempt to repair missing metadata in database entries."""
+        """Attempt to repair missing metadata in database entries.
+        
+        File groups without an index row (left by an import that was interrupted before the
+        index was written) are indexed as well.
+        """
+        self.flush_index()
         try:
             if not self.db_path:
                 return False
             
-            with h5py.File(self.db_path, 'r+') as f:
-                file_index = json.loads(f['metadata']['file_index'][()])
-                repaired_count = 0
+            # Check on the read-only handle first so a healthy database is never reopened for writing
+            with self._open_db('r') as f:
+                file_index = self._get_file_index(f)
+                unindexed = [file_id for file_id in f['files'] if file_id not in file_index]
+                if not unindexed and not any(map(needs_path_repair, file_index.values())):
+                    return False
+            
+            self._invalidate_cache()
+            with self._open_db('r+') as f:
+                repaired = {}
                 
-                for file_id, file_info in file_index.items():
-                    if not file_info.get('original_path') or file_info.get('original_path') == 'Unknown':
-                        logger.debug(f"Attempting to repair metadata for file {file_id}")
-                        
-                        # Try to find metadata in the HDF5 group
-                        if f'files/{file_id}' in f:
-                            file_group = f[f'files/{file_id}']
-                            
-                            # Check attributes for original filename
-                            for attr_name in file_group.attrs.keys():
-                                attr_value = file_group.attrs[attr_name]
-                                if isinstance(attr_value, bytes):
-                                    attr_value = attr_value.decode('utf-8', errors='ignore')
-                                
-                                if isinstance(attr_value, str) and ('/' in attr_value or '\\' in attr_value) and '.' in attr_value:
-                                    logger.info(f"Recovered path for {file_id}: {attr_value}")
-                                    file_info['original_path'] = attr_value
-                                    file_info['file_name'] = os.path.basename(attr_value)
-                                    
-                                    # Infer file type from extension
-                                    ext = os.path.splitext(attr_value)[1].lower()
-                                    if ext in ['.flz', '.fld']:
-                                        file_info['file_type'] = 'flz'
-                                    elif ext == '.flr':
-                                        file_info['file_type'] = 'flr'
-                                    elif ext == '.flb':
-                                        file_info['file_type'] = 'flb'
-                                    
-                                    repaired_count += 1
-                                    break
-                            
-                            # If no path found, create default based on available data
-                            if not file_info.get('original_path') or file_info.get('original_path') == 'Unknown':
-                                if 'raw_data' in file_group and 'photon_data' in file_group['raw_data']:
-                                    file_info['original_path'] = f"recovered_photon_data_{file_id}.flz"
-                                    file_info['file_type'] = 'flz'
-                                else:
-                                    file_info['original_path'] = f"recovered_file_{file_id}"
-                                    file_info['file_type'] = 'unknown'
-                                
-                                file_info['file_name'] = os.path.basename(file_info['original_path'])
-                                file_info['status'] = 'recovered'
-                                repaired_count += 1
-                
-                # Save repaired index
-                if repaired_count > 0:
-                    f['metadata']['file_index'][()] = json.dumps(file_index).encode('utf-8')
-                    logger.info(f"Repaired metadata for {repaired_count} database entries")
-                
-                return repaired_count > 0
+                for file_id, file_info in self._get_file_index(f).items():
+                    file_info = dict(file_info)
+                    if self._repair_index_entry(f, file_id, file_info):
+                        repaired[file_id] = file_info
+                
+                for file_id in unindexed:
+                    raw_group = f['files'][file_id].get('raw_data')
+                    file_info = {f'has_{key}': raw_group is not None and key in raw_group for key in RAW_DATA_KEYS}
+                    self._repair_index_entry(f, file_id, file_info)
+                    repaired[file_id] = file_info
+                
+                # Save repaired entries
+                if repaired:
+                    self._write_index_entries(f, repaired)
+                    logger.info(f"Repaired metadata for {len(repaired)} database entries")
+                
+                return bool(repaired)
                 
         except Exception as e:
             logger.error(f"Error during metadata repair: {e}")
             return False
     
+    def _repair_index_entry(self, f, file_id, file_info):
+        """Fill in a missing original path from the file's group; returns True if file_info changed."""
+        if not needs_path_repair(file_info):
+            return False
+        if f'files/{file_id}' not in f:
+            return False
+        
+        logger.debug("Attempting to repair metadata for file %s", file_id)
+        file_group = f[f'files/{file_id}']
+        
+        # Check attributes for original filename
+        for attr_value in file_group.attrs.values():
+            if isinstance(attr_value, bytes):
+                attr_value = attr_value.decode('utf-8', errors='ignore')
+            
+            if isinstance(attr_value, str) and PATH_LIKE_RE.search(attr_value) is not None:
+                logger.info(f"Recovered path for {file_id}: {attr_value}")
+                file_info['original_path'] = attr_value
+                file_info['file_name'] = os.path.basename(attr_value)
+                
+                # Infer file type from extension
+                ext = os.path.splitext(attr_value)[1].lower()
+                if ext in EXTENSION_FILE_TYPES:
+                    file_info['file_type'] = EXTENSION_FILE_TYPES[ext]
+                return True
+        
+        # FLR/FLB files record their original file name in the file metadata
+        if 'metadata' in file_group and 'file_metadata' in file_group['metadata']:
+            try:
+                metadata = _json_loads(file_group['metadata']['file_metadata'][()])
+            except (json.JSONDecodeError, TypeError):
+                metadata = None
+            if isinstance(metadata, dict) and metadata.get('original_filename'):
+                logger.info(f"Recovered file name for {file_id}: {metadata['original_filename']}")
+                file_info['original_path'] = metadata['original_filename']
+                file_info['file_name'] = metadata['original_filename']
+                file_info['file_type'] = metadata.get('file_type', file_info.get('file_type', 'unknown'))
+                return True
+        
+        # If no path found, create default based on available data
+        if 'raw_data' in file_group and 'photon_data' in file_group['raw_data']:
+            file_info['original_path'] = f"recovered_photon_data_{file_id}.flz"
+            file_info['file_type'] = 'flz'
+        else:
+            file_info['original_path'] = f"recovered_file_{file_id}"
+            file_info['file_type'] = 'unknown'
+        
+        file_info['file_name'] = os.path.basename(file_info['original_path'])
+        file_info['status'] = 'recovered'
+        return True
+    
     def delete_file(self, file_id):
         """Delete a file from the database."""
-        logger.debug(f"Attempting to delete file: {file_id}")
+        logger.debug("Attempting to delete file: %s", file_id)
+        self.flush_index()
         try:
             if not self.db_path:
                 logger.error("Cannot delete file: No database is currently opened")
                 return False
                 
-            with h5py.File(self.db_path, 'a') as f:
+            self._invalidate_cache(file_id)
+            with self._open_db('a') as f:
                 if file_id not in f['files']:
                     logger.warning(f"File ID '{file_id}' not found in database")
                     return False
                 
-                logger.debug(f"Removing file group for ID: {file_id}")
+                logger.debug("Removing file group for ID: %s", file_id)
                 # Delete the file group
                 del f['files'][file_id]
                 
                 # Update file index
-                file_index = json.loads(f['metadata']['file_index'][()])
-                if file_id in file_index:
-                    del file_index[file_id]
-                    del f['metadata']['file_index']
-                    f['metadata'].create_dataset('file_index', data=json.dumps(file_index))
+                if self._remove_index_entry(f, file_id):
                     logger.debug("Updated file index after deletion")
             
             logger.info(f"Successfully deleted file '{file_id}' from database")
@@ -776,51 +1767,66 @@ class DataManager:
             logger.critical(f"Critical error deleting file '{file_id}': {e}")
             return False
 
-    def duplicate_file(self, file_id):
-        """Duplicate a file in the database."""
-        logger.debug(f"Attempting to duplicate file: {file_id}")
+    def duplicate_file(self, file_id, deep=False):
+        """Duplicate a file in the database.
+        
+        Unless deep is set, the duplicate shares the original's raw_data group through a
+        hard link instead of copying it; raw data is never modified after import, and
+        the shared group is only removed once neither file links to it.
+        """
+        logger.debug("Attempting to duplicate file: %s", file_id)
+        self.flush_index()
         try:
             if not self.db_path:
                 logger.error("Cannot duplicate file: No database is currently opened")
                 return None
                 
-            with h5py.File(self.db_path, 'a') as f:
+            with self._open_db('a') as f:
                 if file_id not in f['files']:
                     logger.warning(f"File ID '{file_id}' not found in database")
                     return None
                 
                 # Generate new unique ID for the duplicate
                 new_file_id = str(uuid.uuid4())
-                logger.debug(f"Generated new ID for duplicate: {new_file_id}")
+                logger.debug("Generated new ID for duplicate: %s", new_file_id)
+                self._invalidate_cache(new_file_id)
                 
-                # Copy the entire file structure
-                f.copy(f'files/{file_id}', f['files'], name=new_file_id)
+                if deep:
+                    # Copy the entire file structure
+                    f.copy(f'files/{file_id}', f['files'], name=new_file_id)
+                else:
+                    # Copy metadata and analysis results, link the raw data
+                    source_group = f['files'][file_id]
+                    new_group = f['files'].create_group(new_file_id)
+                    for key, value in source_group.attrs.items():
+                        new_group.attrs[key] = value
+                    for name, child in source_group.items():
+                        if name == 'raw_data':
+                            new_group[name] = child
+                        else:
+                            f.copy(child, new_group, name=name)
                 
                 # Update file index with duplicate information
-                file_index = json.loads(f['metadata']['file_index'][()])
-                if file_id in file_index:
-                    duplicate_info = file_index[file_id].copy()
+                duplicate_info = self._get_file_index(f).get(file_id)
+                if duplicate_info is not None:
+                    duplicate_info = dict(duplicate_info)
                     
                     # Modify the duplicate's metadata
                     original_name = duplicate_info.get('file_name', duplicate_info.get('original_path', ''))
                     if original_name:
                         # Extract filename and add _copy suffix
-                        import os
-                        name, ext = os.path.splitext(os.path.basename(original_name))
-                        duplicate_info['file_name'] = f"{name}_copy{ext}"
+                        original_name = PurePath(original_name)
+                        copy_name = f"{original_name.stem}_copy{original_name.suffix}"
+                        duplicate_info['file_name'] = copy_name
                         if 'original_path' in duplicate_info:
                             path_dir = os.path.dirname(duplicate_info['original_path'])
-                            duplicate_info['original_path'] = os.path.join(path_dir, f"{name}_copy{ext}")
+                            duplicate_info['original_path'] = os.path.join(path_dir, copy_name)
                     
                     duplicate_info['duplicated_from'] = file_id
                     duplicate_info['duplicated_at'] = datetime.now().isoformat()
                     duplicate_info['added'] = datetime.now().isoformat()
                     
-                    file_index[new_file_id] = duplicate_info
-                    
-                    # Update the dataset
-                    del f['metadata']['file_index']
-                    f['metadata'].create_dataset('file_index', data=json.dumps(file_index))
+                    self._write_index_entries(f, {new_file_id: duplicate_info})
                     logger.debug("Updated file index after duplication")
             
             logger.info(f"Successfully duplicated file '{file_id}' -> '{new_file_id}'")
@@ -832,7 +1838,8 @@ class DataManager:
 
     def rename_file(self, file_id, new_name):
         """Rename a file in the database (updates file_name in metadata)."""
-        logger.debug(f"Attempting to rename file: {file_id} -> {new_name}")
+        logger.debug("Attempting to rename file: %s -> %s", file_id, new_name)
+        self.flush_index()
         try:
             if not self.db_path:
                 logger.error("Cannot rename file: No database is currently opened")
@@ -842,20 +1849,18 @@ class DataManager:
                 logger.error("New file name cannot be empty")
                 return False
                 
-            with h5py.File(self.db_path, 'a') as f:
+            self._invalidate_cache(file_id)
+            with self._open_db('a') as f:
                 if file_id not in f['files']:
                     logger.warning(f"File ID '{file_id}' not found in database")
                     return False
                 
                 # Update file index with new name
-                file_index = json.loads(f['metadata']['file_index'][()])
-                if file_id in file_index:
-                    file_index[file_id]['file_name'] = new_name.strip()
-                    file_index[file_id]['renamed_at'] = datetime.now().isoformat()
-                    
-                    # Update the dataset
-                    del f['metadata']['file_index']
-                    f['metadata'].create_dataset('file_index', data=json.dumps(file_index))
+                if file_id in self._get_file_index(f):
+                    self._write_index_entries(f, {file_id: {
+                        'file_name': new_name.strip(),
+                        'renamed_at': datetime.now().isoformat()
+                    }})
                     logger.debug("Updated file index after rename")
                 
                 # Also update metadata in the file group if it exists
@@ -865,16 +1870,16 @@ class DataManager:
                         if isinstance(metadata_str, bytes):
                             metadata_str = metadata_str.decode('utf-8')
                         
-                        metadata = json.loads(metadata_str)
+                        metadata = _json_loads(metadata_str)
                         metadata['file_name'] = new_name.strip()
                         metadata['renamed_at'] = datetime.now().isoformat()
                         
                         # Update the metadata dataset
                         del f[f'files/{file_id}/metadata/file_metadata']
-                        f[f'files/{file_id}/metadata'].create_dataset('file_metadata', data=json.dumps(metadata))
+                        f[f'files/{file_id}/metadata'].create_dataset('file_metadata', data=_json_dumps(metadata))
                         logger.debug("Updated file metadata after rename")
                     except (json.JSONDecodeError, KeyError) as e:
-                        logger.debug(f"Could not update file metadata: {e}")
+                        logger.debug("Could not update file metadata: %s", e)
             
             logger.info(f"Successfully renamed file '{file_id}' to '{new_name}'")
             return True
@@ -890,22 +1895,35 @@ class DataManager:
                 logger.error("No database opened")
                 return False
                 
-            with h5py.File(other_db_path, 'r') as other_db, h5py.File(self.db_path, 'a') as current_db:
-                # Copy all files from other database
-                for file_id in other_db['files'].keys():
-                    # Generate new unique ID to avoid conflicts
-                    new_id = str(uuid.uuid4())
-                    
-                    # Copy the entire file structure
-                    other_db.copy(f'files/{file_id}', current_db['files'], name=new_id)
-                    
-                    # Update file index
-                    other_index = json.loads(other_db['metadata']['file_index'][()])
+            self._invalidate_cache()
+            with h5py.File(other_db_path, 'r', **h5_open_options('r')) as other_db, self._open_db('a') as current_db:
+                other_index = read_file_index(other_db['metadata'])
+                # Generate new unique IDs to avoid conflicts
+                new_ids = {file_id: str(uuid.uuid4()) for file_id in other_db['files'].keys()}
+                
+                # Copy all files with one H5Ocopy call, which also keeps raw data shared
+                # between duplicates shared, then move them into place under their new IDs
+                staging = MERGE_STAGING_GROUP
+                if staging in current_db:
+                    del current_db[staging]
+                other_db.copy('files', current_db, name=staging)
+                try:
+                    for file_id, new_id in new_ids.items():
+                        current_db.move(f'{staging}/{file_id}', f'files/{new_id}')
+                finally:
+                    del current_db[staging]
+                
+                # Collect the index entries and write them together
+                merged_index = {}
+                for file_id, new_id in new_ids.items():
                     if file_id in other_index:
                         file_info = other_index[file_id]
                         file_info['merged_from'] = other_db_path
                         file_info['merged_at'] = datetime.now().isoformat()
-                        self._update_file_index(new_id, file_info)
+                        merged_index[new_id] = file_info
+                
+                if merged_index:
+                    self._write_index_entries(current_db, merged_index)
             
             logger.info(f"Successfully merged database: {other_db_path}")
             return True
@@ -916,6 +1934,7 @@ class DataManager:
     
     def save_database(self, new_path=None):
         """Save/copy the database to a new location."""
+        self.flush_index()
         try:
             if not self.db_path:
                 logger.error("No database opened")
@@ -925,9 +1944,12 @@ class DataManager:
                 logger.info("Database is automatically saved")
                 return True
             
-            # Copy current database to new location
-            import shutil
-            shutil.copy2(self.db_path, new_path)
+            # Copy current database to new location. Closing it first writes everything and
+            # clears the open-for-write state, so the copy is complete and can be opened;
+            # holding the lock keeps other threads from writing during the copy.
+            with self._h5_lock:
+                self.close()
+                copy_database_file(self.db_path, new_path)
             logger.info(f"Database saved to: {new_path}")
             return True
             
@@ -935,8 +1957,34 @@ class DataManager:
             logger.error(f"Error saving database: {e}")
             return False
     
-    def _extract_flz_contents(self, zip_file):
-        """Extract contents from FLZ zip file."""
+    def compact_database(self, min_free_fraction=0.0):
+        """Compact the current database if at least min_free_fraction of it is free space."""
+        try:
+            if not self.db_path:
+                logger.error("No database opened")
+                return False
+            
+            with self._h5_lock:
+                self.close()
+                if min_free_fraction and database_free_fraction(self.db_path) < min_free_fraction:
+                    return False
+                saved = compact_database_file(self.db_path)
+            
+            logger.info(f"Compacted database {self.db_path}, reclaimed {saved / (1024 * 1024):.1f} MB")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error compacting database: {e}")
+            return False
+    
+    def _extract_flz_contents(self, zip_file, workers=1):
+        """Extract contents from FLZ zip file.
+        
+        With several workers the images and the photon data are decoded on threads of their
+        own while metadata.json is parsed. The members are opened and closed on the calling
+        thread; ZipFile serialises only the reads of the shared file, and inflating and PNG
+        decoding release the GIL.
+        """
         file_data = {
             'metadata': None,
             'alignment_image': None,
@@ -946,72 +1994,234 @@ class DataManager:
         
         file_list = zip_file.namelist()
         
-        # Extract metadata.json
-        if 'metadata.json' in file_list:
-            with zip_file.open('metadata.json') as f:
-                file_data['metadata'] = json.loads(f.read().decode('utf-8'))
+        with contextlib.ExitStack() as stack:
+            # Images are decoded from their member streams, photon data is inflated into an array
+            readers = {}
+            for key, name in FLZ_RAW_MEMBERS.items():
+                if name in file_list:
+                    src = stack.enter_context(zip_file.open(name))
+                    if key == 'photon_data':
+                        readers[key] = functools.partial(read_stream_array, src, zip_file.getinfo(name).file_size)
+                    else:
+                        readers[key] = functools.partial(decode_image, src)
+            
+            futures = None
+            if workers > 1 and len(readers) > 1:
+                # Entered last, so the workers are done before the members are closed
+                pool = stack.enter_context(ThreadPoolExecutor(max_workers=min(workers, len(readers))))
+                futures = {key: pool.submit(read) for key, read in readers.items()}
+            
+            # Extract metadata.json
+            if 'metadata.json' in file_list:
+                with zip_file.open('metadata.json') as f:
+                    file_data['metadata'] = _json_loads(f.read())
+            
+            for key, read in readers.items():
+                file_data[key] = futures[key].result() if futures else read()
         
-        # Extract images
-        if 'Alignment_Image.png' in file_list:
-            with zip_file.open('Alignment_Image.png') as f:
-                img = Image.open(io.BytesIO(f.read()))
-                file_data['alignment_image'] = np.array(img)
+        return file_data
+    
+    def close(self):
+        """Write pending file index updates and close the handle on the current database.
+        
+        The handle is reopened on the next access.
+        """
+        with self._h5_lock:
+            self.flush_index()
+            self._close_handle()
+    
+    def _close_handle(self):
+        """Close the handle on the current database (flushing any writes) without touching the index."""
+        with self._h5_lock:
+            if self._h5 is not None:
+                if self._h5.id.valid:
+                    self._h5.close()
+                self._h5 = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def _release_cached_data(self):
+        """Drop everything cached for the current database before switching to another one."""
+        self.close()
+        with self._cache_lock:
+            self._files_cache = None
+            self._file_data_cache.clear()
+            self._file_index = None
+            self._cache_token = None
+        # Cached photon data can be large; reclaim it now rather than at some later collection
+        gc.collect()
+    
+    def _invalidate_cache(self, file_id=None):
+        """Drop cached results before writing to the database.
         
-        if 'LaserOn_Image.png' in file_list:
-            with zip_file.open('LaserOn_Image.png') as f:
-                img = Image.open(io.BytesIO(f.read()))
-                file_data['laser_on_image'] = np.array(img)
+        If the write only touches one file, the cached data of the other files is kept.
+        """
+        with self._cache_lock:
+            self._db_version += 1
+            self._files_cache = None
+            if file_id is None:
+                self._file_data_cache.clear()
+            else:
+                self._file_data_cache.pop(file_id, None)
+    
+    def _cache_valid(self):
+        """Check whether cached query results still match the database, clearing them if not."""
+        try:
+            stat = os.stat(self.db_path)
+            token = (self.db_path, stat.st_mtime_ns, stat.st_size)
+        except (OSError, TypeError):
+            token = None
+        if token is None or token != self._cache_token:
+            # Changes made through this instance already dropped the affected entries;
+            # anything else (another database, an external write) invalidates everything
+            own_write = (token is not None and self._cache_token is not None and
+                         token[0] == self._cache_token[0] and self._cache_version != self._db_version)
+            if not own_write:
+                self._files_cache = None
+                self._file_data_cache.clear()
+                self._file_index = None
+            self._cache_token = token
+        self._cache_version = self._db_version
+        return token is not None
+    
+    def _open_db(self, mode='r', db_path=None):
+        """Open the database with the tuned HDF5 settings used for all reads and writes.
         
-        # Extract photon data
-        if 'photon_data.flr' in file_list:
-            with zip_file.open('photon_data.flr') as f:
-                file_data['photon_data'] = np.frombuffer(f.read(), dtype=np.uint8)
+        The current database is accessed through one long-lived handle; an explicit
+        db_path (creating or checking a database) gets a handle of its own.
+        """
+        if db_path is None:
+            return self._shared_db(writable=mode != 'r')
+        return h5py.File(db_path, mode, **h5_open_options(mode))
+    
+    @contextlib.contextmanager
+    def _shared_db(self, writable):
+        """Yield the handle on the current database, opening it if needed.
         
-        return file_data
+        Reads share one long-lived read-only handle. A write reopens it for writing and the
+        outermost block closes it again, so between writes (or after a crash) the file is
+        complete, is not marked as open for writing and can be opened by other processes.
+        Inside a batch_writes block the batch's write handle is used until the batch ends.
+        """
+        with self._h5_lock:
+            if self._bulk_db is not None:
+                # Only the thread running the batch gets here; it holds _h5_lock
+                yield self._bulk_db
+                return
+            if self._h5 is not None and (not self._h5.id.valid or (writable and self._h5.mode == 'r')):
+                self._close_handle()
+            if self._h5 is None:
+                mode = 'a' if writable else 'r'
+                self._h5 = h5py.File(self.db_path, mode, **h5_open_options(mode))
+            self._h5_users += 1
+            try:
+                yield self._h5
+            finally:
+                self._h5_users -= 1
+                if not self._h5_users and self._h5 is not None and self._h5.mode != 'r':
+                    self._close_handle()
+                    with self._cache_lock:
+                        # The file changed through our own (already invalidated) writes, so the
+                        # next cache check must not mistake it for an external change
+                        self._db_version += 1
     
-    def _update_file_index(self, file_id, file_info):
-        """Update the file index with new file information."""
-        with h5py.File(self.db_path, 'a') as f:
-            current_index = json.loads(f['metadata']['file_index'][()])
-            
-            # If file_id exists, merge with existing info instead of replacing
-            if file_id in current_index:
-                current_index[file_id].update(file_info)
+    def _update_file_index(self, file_id, f, file_info):
+        """Write new file information to the file index of the open database f.
+        
+        Inside a batch_writes block the update is queued instead, and the whole batch costs a
+        single index write when the block ends.
+        """
+        self._invalidate_cache(file_id)
+        with self._h5_lock:
+            if self._bulk_db is not None:
+                self._pending_index.setdefault(file_id, {}).update(file_info)
             else:
-                current_index[file_id] = file_info
-            
-            # Update the dataset
-            del f['metadata']['file_index']
-            f['metadata'].create_dataset('file_index', data=json.dumps(current_index))
+                self._write_index_entries(f, {file_id: file_info})
+    
+    def flush_index(self):
+        """Write the file index updates queued by a batch_writes block with one index write."""
+        with self._h5_lock:
+            if not self._pending_index or not self.db_path:
+                return True
+            pending_index = self._pending_index
+            try:
+                with self._open_db('a') as f:
+                    self._write_index_entries(f, pending_index)
+            except Exception as e:
+                logger.error(f"Error writing file index: {e}")
+                return False
+            self._pending_index = {}
+            return True
+    
+    def _get_file_index(self, f):
+        """Return the parsed file index of the open database f, reading it only when not cached.
+        
+        The returned dicts are shared with the cache and must not be modified.
+        """
+        with self._cache_lock:
+            if self._cache_valid() and self._file_index is not None:
+                return self._file_index
+        file_index = read_file_index(f['metadata'])
+        with self._cache_lock:
+            self._file_index = file_index
+        return file_index
+    
+    def _write_index_entries(self, f, entries):
+        """Write file index entries to the open database f and apply them to the cached index."""
+        metadata_group = f['metadata']
+        converts = ('file_index_table' not in metadata_group or
+                    metadata_group['file_index_table'].dtype != FILE_INDEX_DTYPE)
+        written = write_file_index_entries(f, entries)
+        with self._cache_lock:
+            if converts:
+                # Converting an older layout rewrites every row
+                self._file_index = None
+            elif self._file_index is not None:
+                self._file_index.update(written)
+    
+    def _remove_index_entry(self, f, file_id):
+        """Remove a file from the file index of the open database f and from the cached index."""
+        removed = remove_file_index_entry(f, file_id)
+        with self._cache_lock:
+            if self._file_index is not None:
+                if 'file_index_table' in f['metadata'] and f['metadata']['file_index_table'].dtype == FILE_INDEX_DTYPE:
+                    self._file_index.pop(file_id, None)
+                else:
+                    self._file_index = None
+        return removed
     
     def get_database_info(self):
         """Get database information and statistics."""
         logger.debug("Retrieving database information and statistics")
+        self.flush_index()
         try:
             if not self.db_path:
                 logger.error("Cannot get database info: No database is currently opened")
                 return None
                 
-            if not os.path.exists(self.db_path):
+            # One stat both checks that the file exists and gives its size
+            try:
+                stat = os.stat(self.db_path)
+            except FileNotFoundError:
                 logger.error(f"Database file not found: {self.db_path}")
                 return None
                 
-            with h5py.File(self.db_path, 'r') as f:
+            with self._open_db('r') as f:
                 logger.debug("Reading database metadata")
-                db_info = json.loads(f['metadata']['db_info'][()])
-                file_index = json.loads(f['metadata']['file_index'][()])
+                db_info = _json_loads(f['metadata']['db_info'][()])
+                file_index = self._get_file_index(f)
                 
                 # Calculate statistics
                 total_files = len(file_index)
-                file_types = {}
-                for file_info in file_index.values():
-                    file_type = file_info.get('file_type', 'unknown')
-                    file_types[file_type] = file_types.get(file_type, 0) + 1
+                file_types = dict(Counter(file_info.get('file_type', 'unknown') for file_info in file_index.values()))
                 
-                logger.debug(f"Database statistics: {total_files} files, types: {file_types}")
+                logger.debug("Database statistics: %s files, types: %s", total_files, file_types)
                 
-                file_size_bytes = os.path.getsize(self.db_path)
-                file_size_mb = int(file_size_bytes / (1024 * 1024))
+                file_size_mb = stat.st_size >> 20
                 
                 result = {
                     'database info': db_info,
@@ -1038,25 +2248,77 @@ class DataManager:
             return None
 
     # Legacy methods for backward compatibility
-    def load_csv(self, file_path):
-        """Legacy method to load CSV files."""
+    def load_csv(self, file_path, on_chunk=None):
+        """Legacy method to load CSV files.
+        
+        If on_chunk is given the file is parsed in chunks and each chunk is passed
+        to it as soon as it is parsed, so callers can show the first rows before
+        the whole file has been read.
+        """
+        # Free the previous file's frame before parsing the next one
+        self.legacy_data = None
+        gc.collect()
         try:
-            self.legacy_data = pd.read_csv(file_path)
+            if on_chunk is not None:
+                self.legacy_data = self._load_csv_chunked(file_path, on_chunk)
+            elif PYARROW_AVAILABLE:
+                table = pacsv.read_csv(
+                    file_path, read_options=pacsv.ReadOptions(use_threads=True, block_size=8 << 20),
+                    memory_pool=ARROW_MEMORY_POOL
+                )
+                # Release each Arrow column as it is converted instead of holding both copies
+                self.legacy_data = table.to_pandas(
+                    memory_pool=ARROW_MEMORY_POOL, self_destruct=True, types_mapper=pd.ArrowDtype
+                )
+                del table
+            else:
+                self.legacy_data = pd.read_csv(file_path, engine='c', memory_map=True)
             logger.info(f"Loaded CSV file: {file_path}")
         except Exception as e:
             logger.error(f"Error loading CSV file {file_path}: {e}")
             self.legacy_data = pd.DataFrame()
+        return self.legacy_data
+
+    def _load_csv_chunked(self, file_path, on_chunk):
+        """Parse a CSV file chunk by chunk, handing each chunk to on_chunk."""
+        chunks = []
+        if PYARROW_AVAILABLE:
+            reader = pacsv.open_csv(
+                file_path, read_options=pacsv.ReadOptions(block_size=8 << 20), memory_pool=ARROW_MEMORY_POOL
+            )
+            start = 0
+            for batch in reader:
+                chunk = batch.to_pandas(memory_pool=ARROW_MEMORY_POOL, types_mapper=pd.ArrowDtype)
+                # Continue the row numbering across batches like pandas' chunked reader does
+                chunk.index = pd.RangeIndex(start, start + len(chunk))
+                start += len(chunk)
+                chunks.append(chunk)
+                on_chunk(chunk)
+        else:
+            with pd.read_csv(file_path, chunksize=CSV_CHUNK_SIZE, engine='c', memory_map=True) as reader:
+                for chunk in reader:
+                    chunks.append(chunk)
+                    on_chunk(chunk)
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks)
 
     def get_data(self):
         """Legacy method to get loaded CSV data."""
-        if hasattr(self, 'legacy_data'):
+        if self.legacy_data is not None:
             return self.legacy_data
         return pd.DataFrame()
 
+    def arrow_bytes_allocated(self):
+        """Return the bytes currently held in Arrow buffers (0 without PyArrow)."""
+        if ARROW_MEMORY_POOL is None:
+            return 0
+        return ARROW_MEMORY_POOL.bytes_allocated()
+
     def save_csv(self, file_path):
         """Legacy method to save CSV files."""
         try:
-            if hasattr(self, 'legacy_data'):
+            if self.legacy_data is not None:
                 self.legacy_data.to_csv(file_path, index=False)
                 logger.info(f"Saved CSV file: {file_path}")
             else:
@@ -330,6 +330,7 @@ class MainWindow:
                         dpg.add_separator()
                         dpg.add_menu_item(label="Refresh Table", callback=self._refresh_table)
                         dpg.add_menu_item(label="Database Info", callback=self._show_database_info)
+                        dpg.add_menu_item(label="Compact Database", callback=lambda: self.app.compact_database())
                         dpg.add_separator()
                         dpg.add_menu_item(label="Export to CSV", callback=self._export_database_csv)
 
@@ -351,7 +352,7 @@ class MainWindow:
         with dpg.handler_registry():
             dpg.add_mouse_drag_handler(callback=self._on_drag)
 
-        with dpg.file_dialog(directory_selector=False, show=False, callback=self._on_file_drop, tag="file_drop_dialog", width=500, height=400):
+        with dpg.file_dialog(directory_selector=False, show=False, callback=self._on_file_drop, tag="file_drop_dialog", width=500, height=400, file_count=100):
             dpg.add_file_extension(".*")
             dpg.add_file_extension(".csv")
 
@@ -364,7 +365,11 @@ class MainWindow:
             pass
 
     def _on_file_drop(self, sender, app_data):
-        if 'file_path_name' in app_data:
+        selections = list(app_data.get('selections', {}).values())
+        if len(selections) > 1:
+            # Add all selected files as one batch
+            self.app.open_files(selections)
+        elif 'file_path_name' in app_data:
             self.app.open_file(app_data['file_path_name'])
         dpg.hide_item("file_drop_dialog")
 
@@ -417,21 +422,30 @@ class MainWindow:
             
             added_count = 0
             
-            for i, filename in enumerate(flz_files):
-                file_path = os.path.join(folder_path, filename)
-                
-                # Update progress
-                progress = (i + 1) / total_files
-                self.progress_bar.set_progress(progress)
-                self.progress_bar.set_overlay(f"FLZ: {i + 1}/{total_files}")
-                self.status_bar.set_status(f"Processing FLZ files... ({i + 1}/{total_files})")
-                
-                try:
-                    file_id = self.app.data_manager.add_flz_file(file_path)
-                    added_count += 1
-                    print(f"Added FLZ file: {file_id}")
-                except Exception as e:
-                    print(f"Error processing {filename}: {e}")
+            # Read and decode the files ahead of the database writes instead of one at a time
+            file_paths = [os.path.join(folder_path, filename) for filename in flz_files]
+            decoded = self.app.data_manager.read_flz_batched(file_paths)
+            
+            with self.app.data_manager.batch_writes():
+                for i, (file_path, file_data) in enumerate(decoded):
+                    filename = os.path.basename(file_path)
+                    
+                    # Update progress
+                    progress = (i + 1) / total_files
+                    self.progress_bar.set_progress(progress)
+                    self.progress_bar.set_overlay(f"FLZ: {i + 1}/{total_files}")
+                    self.status_bar.set_status(f"Processing FLZ files... ({i + 1}/{total_files})")
+                    
+                    if file_data is None:
+                        print(f"Error processing {filename}: could not decode file")
+                        continue
+                    
+                    try:
+                        file_id = self.app.data_manager.add_flz_file(file_path, file_data=file_data)
+                        added_count += 1
+                        print(f"Added FLZ file: {file_id}")
+                    except Exception as e:
+                        print(f"Error processing {filename}: {e}")
             
             # Hide progress bar and show completion
             self.progress_bar.hide()
@@ -492,21 +506,26 @@ class MainWindow:
             
             added_count = 0
             
-            for i, filename in enumerate(flr_files):
-                file_path = os.path.join(folder_path, filename)
-                
-                # Update progress
-                progress = (i + 1) / total_files
-                self.progress_bar.set_progress(progress)
-                self.progress_bar.set_overlay(f"FLR: {i + 1}/{total_files}")
-                self.status_bar.set_status(f"Processing FLR files... ({i + 1}/{total_files})")
-                
-                try:
-                    file_id = self.app.data_manager.add_flr_file(file_path)
-                    added_count += 1
-                    print(f"Added FLR file: {file_id}")
-                except Exception as e:
-                    print(f"Error processing {filename}: {e}")
+            # Read the files ahead of the database writes instead of one at a time
+            file_paths = [os.path.join(folder_path, filename) for filename in flr_files]
+            blobs = self.app.data_manager.read_blobs_batched(file_paths)
+            
+            with self.app.data_manager.batch_writes():
+                for i, (file_path, data) in enumerate(blobs):
+                    filename = os.path.basename(file_path)
+                    
+                    # Update progress
+                    progress = (i + 1) / total_files
+                    self.progress_bar.set_progress(progress)
+                    self.progress_bar.set_overlay(f"FLR: {i + 1}/{total_files}")
+                    self.status_bar.set_status(f"Processing FLR files... ({i + 1}/{total_files})")
+                    
+                    try:
+                        file_id = self.app.data_manager.add_flr_file(file_path, data=data)
+                        added_count += 1
+                        print(f"Added FLR file: {file_id}")
+                    except Exception as e:
+                        print(f"Error processing {filename}: {e}")
             
             # Hide progress bar and show completion
             self.progress_bar.hide()
@@ -567,21 +586,26 @@ class MainWindow:
             
             added_count = 0
             
-            for i, filename in enumerate(flb_files):
-                file_path = os.path.join(folder_path, filename)
-                
-                # Update progress
-                progress = (i + 1) / total_files
-                self.progress_bar.set_progress(progress)
-                self.progress_bar.set_overlay(f"FLB: {i + 1}/{total_files}")
-                self.status_bar.set_status(f"Processing FLB files... ({i + 1}/{total_files})")
-                
-                try:
-                    file_id = self.app.data_manager.add_flb_file(file_path)
-                    added_count += 1
-                    print(f"Added FLB file: {file_id}")
-                except Exception as e:
-                    print(f"Error processing {filename}: {e}")
+            # Read the files ahead of the database writes instead of one at a time
+            file_paths = [os.path.join(folder_path, filename) for filename in flb_files]
+            blobs = self.app.data_manager.read_blobs_batched(file_paths)
+            
+            with self.app.data_manager.batch_writes():
+                for i, (file_path, data) in enumerate(blobs):
+                    filename = os.path.basename(file_path)
+                    
+                    # Update progress
+                    progress = (i + 1) / total_files
+                    self.progress_bar.set_progress(progress)
+                    self.progress_bar.set_overlay(f"FLB: {i + 1}/{total_files}")
+                    self.status_bar.set_status(f"Processing FLB files... ({i + 1}/{total_files})")
+                    
+                    try:
+                        file_id = self.app.data_manager.add_flb_file(file_path, data=data)
+                        added_count += 1
+                        print(f"Added FLB file: {file_id}")
+                    except Exception as e:
+                        print(f"Error processing {filename}: {e}")
             
             # Hide progress bar and show completion
             self.progress_bar.hide()
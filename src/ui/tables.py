@@ -5,15 +5,25 @@ import threading
 import concurrent.futures
 from .theme import create_plot_themes
 from ..analysis.signal_processing import deadtime_correction, analyze_photon_data, analyze_photon_data_raw
+from ..core.data_manager import format_file_list
 
-# Try to import FLR reading tools
-try:
-    import pyrp
-    from ResultsProcessor.Utility import FLBTools, FLRTools
-    FLR_TOOLS_AVAILABLE = True
-except ImportError:
-    FLR_TOOLS_AVAILABLE = False
-    print("FLR tools not available - photon data will be read as raw bytes")
+# FLR reading tools are imported on first use - importing pyrp boots the .NET CLR,
+# which would otherwise slow down application startup
+FLRTools = None
+FLR_TOOLS_AVAILABLE = None
+
+def _load_flr_tools():
+    """Try to import the FLR reading tools once and report whether they are available."""
+    global FLRTools, FLR_TOOLS_AVAILABLE
+    if FLR_TOOLS_AVAILABLE is None:
+        try:
+            import pyrp
+            from ResultsProcessor.Utility import FLRTools
+            FLR_TOOLS_AVAILABLE = True
+        except ImportError:
+            FLR_TOOLS_AVAILABLE = False
+            print("FLR tools not available - photon data will be read as raw bytes")
+    return FLR_TOOLS_AVAILABLE
 
 class TableViewer:
     def __init__(self, app=None):
@@ -27,6 +37,7 @@ class TableViewer:
         self.selected_row_theme = None
         self.default_row_theme = None
         self.context_menu_row = None  # Track which row the context menu was opened on
+        self.showing_database_records = False  # Whether the table currently lists database records
         
         # Single plot management
         self.current_photon_data = None
@@ -37,9 +48,10 @@ class TableViewer:
         self.processing_lock = threading.Lock()
         self.current_processing_task = None
         
-        self.data = pd.DataFrame(columns=["File name","UPC", "BG [kcps]", "FL [kcps]", "Flowrate [uL/min]", "Signal CV%"])
-        for n in range(20):
-            self.data.loc[n] = [f"example{n}.flx", f"{123456789012 + n}", 150 - n, 300 + n, 0.5 + n * 0.1, 5.0 + n * 0.5]
+        # Build the placeholder rows in one go rather than growing the frame row by row
+        self.data = pd.DataFrame(
+            [[f"example{n}.flx", f"{123456789012 + n}", 150 - n, 300 + n, 0.5 + n * 0.1, 5.0 + n * 0.5] for n in range(20)],
+            columns=["File name","UPC", "BG [kcps]", "FL [kcps]", "Flowrate [uL/min]", "Signal CV%"])
 
     def _create_selection_themes(self):
         """Create themes for selected and default row states."""
@@ -203,18 +215,40 @@ class TableViewer:
         if dataframe is None:
             return
 
-        dataframe = dataframe.round(2)
-        
+        self.showing_database_records = False
+        self.update_data_columns(self._frame_columns(dataframe), dataframe.index)
+
+    def update_data_columns(self, columns, index=None):
+        """Rebuild the table from a dict of column arrays; only these columns are rendered."""
         # Clear existing table content
         dpg.delete_item(self.tag, children_only=True)
 
         # Add new columns
-        for col in dataframe.columns:
+        for col in columns:
             dpg.add_table_column(label=col, parent=self.tag)
 
+        self._add_rows(columns, index)
+
+    def append_rows(self, dataframe):
+        """Append rows to the table without rebuilding it (used for chunked loading)."""
+        if dataframe is None or dataframe.empty:
+            return
+        self._add_rows(self._frame_columns(dataframe), dataframe.index)
+
+    def _frame_columns(self, dataframe):
+        """Split a dataframe into per-column arrays."""
+        return {col: dataframe[col].to_numpy() for col in dataframe.columns}
+
+    def _add_rows(self, columns, index=None):
+        if not columns:
+            return
+        # Round numeric columns once per column rather than cell by cell
+        values = [np.round(v, 2) if np.issubdtype(v.dtype, np.number) else v for v in columns.values()]
+        if index is None:
+            index = range(len(values[0]))
+
         # Add new rows with selection capability
-        for index, row in dataframe.iterrows():
-            # print(index, row)
+        for index, *row in zip(index, *values):
             with dpg.table_row(parent=self.tag, tag=f"row_{index}"):
                 # Add text items for each column
                 for col_idx, item in enumerate(row[:-1]):
@@ -244,7 +278,7 @@ class TableViewer:
         self.database_records = records_df
         
         # Create display version with row numbers instead of File ID (hide File Path for cleaner display)
-        display_df = records_df.copy()
+        display_df = format_file_list(records_df)
         columns_to_hide = ['File ID', 'File Path']
         # Remove columns that exist in the dataframe
         columns_to_hide = [col for col in columns_to_hide if col in display_df.columns]
@@ -254,9 +288,30 @@ class TableViewer:
         # Store display data and update table
         self.data = display_df
         self.update_data(display_df)
+        self.showing_database_records = True
         
         print(f"Loaded {len(records_df)} database records into table")
 
+    def append_database_record(self, record_df):
+        """Append a newly added database record without reloading the whole table."""
+        if record_df is None or record_df.empty:
+            return
+        if not self.showing_database_records or list(record_df.columns) != list(self.database_records.columns):
+            # The table shows something else, so build it from this record instead
+            self.load_database_records(record_df)
+            return
+        
+        # Number the new rows after the existing ones, matching load_database_records
+        start = len(self.database_records)
+        record_df = record_df.set_axis(range(start, start + len(record_df)))
+        self.database_records = pd.concat([self.database_records, record_df])
+        
+        display_df = format_file_list(record_df)
+        display_df = display_df.drop(columns=[col for col in ['File ID', 'File Path'] if col in display_df.columns])
+        display_df.insert(0, 'Row', range(start + 1, start + len(record_df) + 1))
+        self.data = pd.concat([self.data, display_df])
+        self.append_rows(display_df)
+
     def _update_details_window_with_db_record(self, row_index):
         """Update the details window with database record information using tabs."""
         if (row_index is None or 
@@ -275,6 +330,7 @@ class TableViewer:
         # Get the database record
         record = self.database_records.iloc[row_index]
         file_id = record.get('file_id', record.get('File ID', ''))
+        display_record = format_file_list(self.database_records.iloc[[row_index]]).iloc[0]
         
         # Create new details content without tabs - linear layout
         with dpg.group(tag="details_content", parent="details_window"):
@@ -286,7 +342,7 @@ class TableViewer:
                     dpg.add_spacer(height=2)
                     
                     # Display basic file information in a more compact format
-                    for col_name, value in record.items():
+                    for col_name, value in display_record.items():
                         with dpg.group(horizontal=True):
                             dpg.add_text(f"{col_name}:", color=[200, 200, 200])
                             dpg.add_spacer(width=10)
@@ -659,7 +715,7 @@ class TableViewer:
     def _read_flr_data(self, flr_file_path):
         """Read FLR data using the provided tools or fallback method."""
         try:
-            if FLR_TOOLS_AVAILABLE:
+            if _load_flr_tools():
                 # Use the provided FLR tools
                 data = FLRTools.ReadFLRData(flr_file_path)
                 return data
@@ -1404,7 +1460,8 @@ class TableViewer:
             
             # Save results to database
             if self.app and hasattr(self.app, 'update_file_analysis'):
-                success = self.app.update_file_analysis(self.current_file_id, result)
+                # The save runs on the app's I/O worker; this callback already runs off the GUI thread
+                success = self.app.update_file_analysis(self.current_file_id, result).result()
                 if success:
                     print(f"Analysis results saved for file: {self.current_file_id}")
                     
@@ -1524,25 +1581,16 @@ class TableViewer:
                 analysis_data = file_data['photon_analysis']
                 
                 if 'results' in analysis_data:
-                    # Parse results JSON
-                    import json
-                    try:
-                        if isinstance(analysis_data['results'], str):
-                            results = json.loads(analysis_data['results'])
-                        else:
-                            results = analysis_data['results']
-                        
-                        # Extract start and end bins
-                        start_bins = results.get('start_bins', [])
-                        end_bins = results.get('end_bins', [])
-                        
-                        if start_bins and end_bins:
-                            print(f"Loading {len(start_bins)} peaks from existing analysis")
-                            # Update peak indicators on the plot
-                            self._add_peak_indicators_to_plot(start_bins, end_bins)
-                            
-                    except json.JSONDecodeError as e:
-                        print(f"Error parsing analysis results: {e}")
+                    results = analysis_data['results']
+                    
+                    # Extract start and end bins
+                    start_bins = results.get('start_bins', [])
+                    end_bins = results.get('end_bins', [])
+                    
+                    if start_bins and end_bins:
+                        print(f"Loading {len(start_bins)} peaks from existing analysis")
+                        # Update peak indicators on the plot
+                        self._add_peak_indicators_to_plot(start_bins, end_bins)
             else:
                 print("No existing analysis results found")        
                         
@@ -1,7 +1,28 @@
+import io
 import unittest
+import numpy as np
 import pandas as pd
-from src.core.data_manager import DataManager
+import h5py
+import json
+import tempfile
+import threading
+import zipfile
+from PIL import Image
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from src.core.data_manager import (DataManager, create_file_index_dataset, read_file_index_bytes, write_file_index_bytes,
+                                   create_file_index_table, read_file_index, write_file_index_entries, remove_file_index_entry,
+                                   PHOTON_DATA_CHUNK_BYTES, write_analysis_results, read_analysis_results, decode_image,
+                                   format_file_list, FILE_INDEX_DTYPE, file_index_row, analysed_file_ids,
+                                   H5_FILE_SPACE_PAGE_BYTES, read_raw_dataset,
+                                   read_zip_member_array)
 import os
+import database_repair_utility
+
+try:
+    from src.core.app import App
+except ImportError:  # the GUI toolkit is not installed
+    App = None
 
 class TestDataManager(unittest.TestCase):
 
@@ -20,5 +41,618 @@ class TestDataManager(unittest.TestCase):
         self.assertIsNotNone(df)
         self.assertEqual(df.shape, (2, 2))
 
+    def test_load_csv_in_chunks(self):
+        chunks = []
+        df = self.data_manager.load_csv(self.test_csv_path, on_chunk=chunks.append)
+        self.assertGreater(len(chunks), 0)
+        self.assertEqual(sum(len(chunk) for chunk in chunks), 2)
+        self.assertEqual(df.shape, (2, 2))
+
+    def test_arrow_bytes_allocated(self):
+        self.data_manager.load_csv(self.test_csv_path)
+        self.assertGreaterEqual(self.data_manager.arrow_bytes_allocated(), 0)
+
+    def test_decode_image(self):
+        image = np.arange(12 * 10, dtype=np.uint8).reshape(12, 10)
+        buf = io.BytesIO()
+        Image.fromarray(image).save(buf, 'PNG')
+        np.testing.assert_array_equal(decode_image(buf.getvalue()), image)
+
+        zip_buf = io.BytesIO()
+        with zipfile.ZipFile(zip_buf, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.writestr('image.png', buf.getvalue())
+        with zipfile.ZipFile(zip_buf) as zip_file, zip_file.open('image.png') as f:
+            np.testing.assert_array_equal(decode_image(f), image)
+
+    def test_only_pngs_are_read_for_imagecodecs(self):
+        image = np.arange(12 * 10, dtype=np.uint8).reshape(12, 10)
+        png_buf, tiff_buf = io.BytesIO(), io.BytesIO()
+        Image.fromarray(image).save(png_buf, 'PNG')
+        Image.fromarray(image).save(tiff_buf, 'TIFF')
+        imagecodecs = mock.Mock(png_decode=mock.Mock(return_value=image))
+        with mock.patch('src.core.data_manager.IMAGECODECS_AVAILABLE', True), \
+             mock.patch('src.core.data_manager.imagecodecs', imagecodecs, create=True), \
+             mock.patch('src.core.data_manager.Image.open', wraps=Image.open) as image_open:
+            png_buf.seek(0)
+            decode_image(png_buf)
+            imagecodecs.png_decode.assert_called_once_with(png_buf.getvalue())
+            image_open.assert_not_called()
+
+            tiff_buf.seek(0)
+            np.testing.assert_array_equal(decode_image(tiff_buf), image)
+            image_open.assert_called_once_with(tiff_buf)
+
+class TestFileIndexStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "test.fldb")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_index_grows_and_shrinks_in_place(self):
+        with h5py.File(self.db_path, 'w') as f:
+            metadata_group = f.create_group('metadata')
+            create_file_index_dataset(metadata_group)
+            for index in ({'a': {'file_type': 'flz'}}, {str(i): {} for i in range(500)}, {}):
+                write_file_index_bytes(metadata_group, json.dumps(index).encode('utf-8'))
+                self.assertEqual(json.loads(read_file_index_bytes(metadata_group)), index)
+
+    def test_legacy_scalar_index_is_migrated(self):
+        with h5py.File(self.db_path, 'w') as f:
+            metadata_group = f.create_group('metadata')
+            metadata_group.create_dataset('file_index', data=json.dumps({'a': {}}))
+            self.assertEqual(json.loads(read_file_index_bytes(metadata_group)), {'a': {}})
+
+            write_file_index_bytes(metadata_group, json.dumps({'a': {}, 'b': {}}).encode('utf-8'))
+            self.assertEqual(metadata_group['file_index'].maxshape, (None,))
+            self.assertEqual(json.loads(read_file_index_bytes(metadata_group)), {'a': {}, 'b': {}})
+
+    def test_table_rows_are_updated_and_removed_in_place(self):
+        with h5py.File(self.db_path, 'w') as f:
+            create_file_index_table(f.create_group('metadata'))
+            f.create_group('files').create_group('b')
+            write_file_index_entries(f, {file_id: {'file_type': 'flb'} for file_id in ('a', 'b', 'c')})
+            write_file_index_entries(f, {'b': {'file_name': 'renamed.flb', 'renamed_at': 'now'}})
+            self.assertTrue(remove_file_index_entry(f, 'a'))
+            self.assertFalse(remove_file_index_entry(f, 'a'))
+
+            index = read_file_index(f['metadata'])
+            self.assertEqual(list(index), ['b', 'c'])
+            self.assertEqual(index['b']['file_type'], 'flb')
+            self.assertEqual(index['b']['file_name'], 'renamed.flb')
+            self.assertEqual(f['files/b'].attrs['renamed_at'], 'now')
+
+    def test_long_non_ascii_paths_are_stored_in_full(self):
+        original_path = '/'.join(['données_mesurées'] * 40) + '/échantillon_µ.flb'
+        file_name = 'échantillon_µ' * 30 + '.flb'
+        self.assertGreater(len(original_path.encode('utf-8')), 512)
+        with h5py.File(self.db_path, 'w') as f:
+            create_file_index_table(f.create_group('metadata'))
+            f.create_group('files')
+            write_file_index_entries(f, {'a': {'original_path': original_path, 'file_name': file_name}})
+
+            index = read_file_index(f['metadata'])
+            self.assertEqual(index['a']['original_path'], original_path)
+            self.assertEqual(index['a']['file_name'], file_name)
+
+    def test_fixed_width_string_table_is_upgraded(self):
+        old_dtype = np.dtype([(name, {'original_path': 'S512', 'file_name': 'S256'}.get(name, FILE_INDEX_DTYPE[name]))
+                              for name in FILE_INDEX_DTYPE.names])
+        row = file_index_row('a', {'original_path': 'x/ä.flr', 'file_name': 'ä.flr'})
+        with h5py.File(self.db_path, 'w') as f:
+            metadata_group = f.create_group('metadata')
+            f.create_group('files')
+            metadata_group.create_dataset('file_index_table', data=np.array([row], dtype=old_dtype), maxshape=(None,))
+
+            write_file_index_entries(f, {'b': {'file_type': 'flz'}})
+            self.assertEqual(metadata_group['file_index_table'].dtype, FILE_INDEX_DTYPE)
+            index = read_file_index(metadata_group)
+            self.assertEqual(index['a']['original_path'], 'x/ä.flr')
+            self.assertEqual(index['a']['file_name'], 'ä.flr')
+
+    def test_legacy_json_index_is_converted_to_table(self):
+        with h5py.File(self.db_path, 'w') as f:
+            metadata_group = f.create_group('metadata')
+            f.create_group('files').create_group('a')
+            create_file_index_dataset(metadata_group)
+            write_file_index_bytes(metadata_group, json.dumps({'a': {'original_path': 'x/a.flr', 'status': 'recovered'}}).encode('utf-8'))
+            self.assertEqual(read_file_index(metadata_group), {'a': {'original_path': 'x/a.flr', 'status': 'recovered'}})
+
+            write_file_index_entries(f, {'b': {'file_type': 'flz'}})
+            self.assertNotIn('file_index', metadata_group)
+            self.assertEqual(list(read_file_index(metadata_group)), ['a', 'b'])
+            self.assertEqual(read_file_index(metadata_group)['a']['original_path'], 'x/a.flr')
+            self.assertEqual(f['files/a'].attrs['status'], 'recovered')
+
+    def test_repair_streams_legacy_index_into_table(self):
+        legacy_index = {'a': {'original_path': 'x/a.flr', 'file_type': 'flr'},
+                        'b': {'original_path': 'Unknown', 'note': 'kept'},
+                        'c': {'original_path': 'x/c.flb', 'file_type': 'flb'}}
+        with h5py.File(self.db_path, 'w') as f:
+            metadata_group = f.create_group('metadata')
+            for file_id in legacy_index:
+                f.create_group(f'files/{file_id}')
+            f['files/b'].attrs['source'] = 'y/b.flz'
+            create_file_index_dataset(metadata_group)
+            write_file_index_bytes(metadata_group, json.dumps(legacy_index).encode('utf-8'))
+
+        # The legacy index is appended in batches instead of being decoded again as a whole
+        with mock.patch('database_repair_utility.FILE_INDEX_TABLE_CHUNK_ROWS', 2), \
+             mock.patch('src.core.data_manager.read_file_index', side_effect=AssertionError):
+            database_repair_utility.repair_database_metadata(self.db_path)
+
+        with h5py.File(self.db_path, 'r') as f:
+            self.assertNotIn('file_index', f['metadata'])
+            index = read_file_index(f['metadata'])
+            self.assertEqual(list(index), ['a', 'b', 'c'])
+            self.assertEqual(index['a']['original_path'], 'x/a.flr')
+            self.assertEqual(index['b']['original_path'], 'y/b.flz')
+            self.assertEqual(index['b']['file_type'], 'flz')
+            self.assertEqual(f['files/b'].attrs['note'], 'kept')
+
+    def test_table_without_summary_columns_is_upgraded(self):
+        old_dtype = np.dtype([(name, FILE_INDEX_DTYPE[name]) for name in FILE_INDEX_DTYPE.names[:9]])
+        with h5py.File(self.db_path, 'w') as f:
+            metadata_group = f.create_group('metadata')
+            write_analysis_results(f.create_group('files/a/photon_analysis'), {'total_peak_count': 4})
+            metadata_group.create_dataset('file_index_table', data=np.array([(b'a', b'a.flr', b'', b'flr', b'', False, False, True, True)],
+                                                                           dtype=old_dtype), maxshape=(None,))
+            self.assertNotIn('peak_count', read_file_index(metadata_group)['a'])
+
+            write_file_index_entries(f, {'b': {'file_type': 'flz'}})
+            self.assertEqual(metadata_group['file_index_table'].dtype, FILE_INDEX_DTYPE)
+            index = read_file_index(metadata_group)
+            self.assertEqual(index['a']['original_path'], 'a.flr')
+            self.assertEqual(index['a']['peak_count'], 4)
+            self.assertTrue(np.isnan(index['b']['peak_count']))
+
+    def test_list_files_without_summary_columns_finds_results_in_one_pass(self):
+        old_dtype = np.dtype([(name, FILE_INDEX_DTYPE[name]) for name in FILE_INDEX_DTYPE.names[:9]])
+        with h5py.File(self.db_path, 'w') as f:
+            metadata_group = f.create_group('metadata')
+            write_analysis_results(f.create_group('files/a/photon_analysis'), {'total_peak_count': 4})
+            f.create_group('files/b/photon_analysis')
+            rows = [(b'a', b'a.flr', b'', b'flr', b'', False, False, True, True),
+                    (b'b', b'b.flr', b'', b'flr', b'', False, False, True, False)]
+            metadata_group.create_dataset('file_index_table', data=np.array(rows, dtype=old_dtype), maxshape=(None,))
+
+        data_manager = DataManager()
+        self.assertTrue(data_manager.open_database(self.db_path))
+        with mock.patch('src.core.data_manager.analysed_file_ids', wraps=analysed_file_ids) as find_analysed:
+            files = data_manager.list_files()
+            find_analysed.assert_called_once()
+        data_manager.close()
+        self.assertEqual(files["Peak Count"].iloc[0], 4)
+        self.assertTrue(pd.isna(files["Peak Count"].iloc[1]))
+
+    def test_raw_datasets_are_read_by_dtype(self):
+        with h5py.File(self.db_path, 'w') as f:
+            self.assertIsNone(read_raw_dataset(f.create_dataset('missing', data=json.dumps(None))))
+            self.assertEqual(read_raw_dataset(f.create_dataset('legacy', data=b'{"not": "json"')), b'{"not": "json"')
+            image = read_raw_dataset(f.create_dataset('image', data=np.ones((2, 3), dtype=np.uint16)))
+            self.assertEqual(image.shape, (2, 3))
+            self.assertEqual(image.dtype, np.uint16)
+
+    def test_zip_member_is_read_into_array(self):
+        payload = bytes(range(256)) * (PHOTON_DATA_CHUNK_BYTES // 256 + 5)
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('photon_data.flr', payload)
+        with zipfile.ZipFile(buf) as zf:
+            values = read_zip_member_array(zf, 'photon_data.flr')
+        self.assertEqual(values.dtype, np.uint8)
+        self.assertEqual(values.tobytes(), payload)
+
+    def test_flz_members_are_decoded_in_parallel(self):
+        image = np.arange(48 * 64, dtype=np.uint8).reshape(48, 64)
+        png = io.BytesIO()
+        Image.fromarray(image).save(png, 'PNG')
+        payload = bytes(range(256)) * (PHOTON_DATA_CHUNK_BYTES // 256 + 5)
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('metadata.json', json.dumps({'k': 1}))
+            zf.writestr('Alignment_Image.png', png.getvalue())
+            zf.writestr('photon_data.flr', payload)
+
+        data_manager = DataManager()
+        with zipfile.ZipFile(buf) as zf, mock.patch('src.core.data_manager.ThreadPoolExecutor',
+                                                     wraps=ThreadPoolExecutor) as pool:
+            file_data = data_manager._extract_flz_contents(zf, workers=3)
+            pool.assert_called_once_with(max_workers=2)
+        self.assertEqual(file_data['metadata'], {'k': 1})
+        np.testing.assert_array_equal(file_data['alignment_image'], image)
+        self.assertIsNone(file_data['laser_on_image'])
+        self.assertEqual(file_data['photon_data'].tobytes(), payload)
+
+    def test_analysis_results_round_trip(self):
+        results = {'total_peak_count': 2, 'signal_cv': 0.5, 'start_bins': [3, 7]}
+        with h5py.File(self.db_path, 'w') as f:
+            write_analysis_results(f.create_group('photon_analysis'), results)
+            self.assertEqual(read_analysis_results(f['photon_analysis/results']), results)
+
+    def test_list_files_repairs_entries_in_one_pass(self):
+        with h5py.File(self.db_path, 'w') as f:
+            metadata_group = f.create_group('metadata')
+            metadata_group.create_dataset('file_index', data=json.dumps({'a': {'name': 'Unknown'}, 'b': {'original_path': 'x/b.flb'}}))
+            f.create_group('files/a/metadata').create_dataset('file_metadata', data=json.dumps({'original_filename': 'a.flr', 'file_type': 'flr'}))
+            f.create_group('files/b')
+
+        data_manager = DataManager()
+        self.assertTrue(data_manager.open_database(self.db_path))
+        with mock.patch.object(data_manager, '_query_files', wraps=data_manager._query_files) as query_files:
+            files = data_manager.list_files()
+            self.assertEqual(query_files.call_count, 1)
+        self.assertEqual(list(files["File Name"]), ["a.flr", "b.flb"])
+        self.assertEqual(list(files["File Type"]), ["flr", "flb"])
+        with h5py.File(self.db_path, 'r') as f:
+            self.assertEqual(read_file_index(f['metadata'])['a']['original_path'], 'a.flr')
+
+class TestQueryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_manager = DataManager()
+        self.data_manager.create_database(os.path.join(self.temp_dir.name, "test.fldb"))
+        self.flb_path = os.path.join(self.temp_dir.name, "sample.flb")
+        with open(self.flb_path, 'wb') as f:
+            f.write(bytes(range(256)))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_writes_invalidate_cached_results(self):
+        self.assertTrue(self.data_manager.list_files().empty)
+        file_id = self.data_manager.add_flb_file(self.flb_path)
+        self.assertEqual(list(self.data_manager.list_files()["File ID"]), [file_id])
+
+        file_data = self.data_manager.get_file_data(file_id)
+        self.assertIs(self.data_manager.get_file_data(file_id), file_data)
+        self.assertIsNone(file_data['photon_analysis'])
+
+        self.data_manager.update_file_analysis(file_id, {'total_peak_count': 3})
+        self.assertEqual(self.data_manager.get_file_data(file_id)['photon_analysis']['results']['total_peak_count'], 3)
+        self.assertEqual(self.data_manager.list_files()["Peak Count"].iloc[0], 3)
+
+    def test_list_files_columns_are_numeric(self):
+        analysed = self.data_manager.add_flb_file(self.flb_path)
+        self.data_manager.add_flb_file(self.flb_path)
+        self.data_manager.update_file_analysis(analysed, {'total_peak_count': 3, 'signal_cv': 0.123})
+
+        files = self.data_manager.list_files()
+        self.assertEqual(str(files["Peak Count"].dtype), "Int64")
+        self.assertEqual(files["Signal CV"].dtype, np.float64)
+        self.assertTrue(pd.isna(files["Peak Count"].iloc[1]))
+
+        display = format_file_list(files)
+        self.assertEqual(list(display["Peak Count"]), ["3", "N/A"])
+        self.assertEqual(list(display["Signal CV"]), ["0.12", "N/A"])
+        self.assertEqual(display["Avg Background"].iloc[0], "0.0")
+
+    def test_list_files_reads_analysis_summary_from_index(self):
+        file_id = self.data_manager.add_flb_file(self.flb_path)
+        self.data_manager.update_file_analysis(file_id, {'total_peak_count': 5, 'avg_particle_transit_time': 1.5})
+        with mock.patch('src.core.data_manager.read_analysis_results') as read_results:
+            files = self.data_manager.list_files()
+            read_results.assert_not_called()
+        self.assertEqual(files["Peak Count"].iloc[0], 5)
+        self.assertEqual(files["Transit Time"].iloc[0], 1.5)
+
+    def test_standalone_writes_update_the_index_on_disk(self):
+        with mock.patch('src.core.data_manager.write_file_index_entries',
+                        wraps=write_file_index_entries) as write_entries:
+            file_ids = [self.data_manager.add_flb_file(self.flb_path) for _ in range(3)]
+            self.data_manager.update_file_analysis(file_ids[0], {'total_peak_count': 2})
+            self.assertEqual(write_entries.call_count, 4)
+
+        # Nothing is left queued or open for writing, so the file is complete as it is
+        self.assertIsNone(self.data_manager._h5)
+        with h5py.File(self.data_manager.db_path, 'r') as f:
+            index = read_file_index(f['metadata'])
+        self.assertEqual(list(index), file_ids)
+        self.assertEqual(index[file_ids[0]]['peak_count'], 2)
+
+    def test_unindexed_file_groups_are_recovered_on_open(self):
+        file_id = self.data_manager.add_flb_file(self.flb_path)
+        self.data_manager.close()
+        with h5py.File(self.data_manager.db_path, 'r+') as f:
+            remove_file_index_entry(f, file_id)
+
+        data_manager = DataManager()
+        self.assertTrue(data_manager.open_database(self.data_manager.db_path))
+        files = data_manager.list_files()
+        self.assertEqual(list(files["File ID"]), [file_id])
+        self.assertEqual(list(files["File Name"]), ["sample.flb"])
+        self.assertEqual(data_manager.get_file_data(file_id)['raw_data']['photon_data'].tobytes(), bytes(range(256)))
+        data_manager.close()
+
+    def test_batch_writes_open_and_index_once(self):
+        with mock.patch('src.core.data_manager.write_file_index_entries', wraps=write_file_index_entries) as write_entries, \
+                mock.patch('h5py.File', wraps=h5py.File) as h5_file:
+            with self.data_manager.batch_writes():
+                with self.data_manager.batch_writes():
+                    file_ids = [self.data_manager.add_flb_file(self.flb_path) for _ in range(3)]
+                write_entries.assert_not_called()
+            self.assertEqual(write_entries.call_count, 1)
+            self.assertEqual(h5_file.call_count, 1)
+        self.assertIsNone(self.data_manager._h5)
+        self.assertEqual(list(self.data_manager.list_files()["File ID"]), file_ids)
+
+    def test_other_threads_wait_for_a_batch(self):
+        file_id = self.data_manager.add_flb_file(self.flb_path)
+        with self.data_manager.batch_writes():
+            self.data_manager.add_flb_file(self.flb_path)
+            worker = threading.Thread(target=self.data_manager.update_file_analysis,
+                                      args=(file_id, {'total_peak_count': 5}))
+            worker.start()
+            worker.join(timeout=0.2)
+            self.assertTrue(worker.is_alive())
+        worker.join()
+        self.assertEqual(self.data_manager.list_files()["Peak Count"].iloc[0], 5)
+
+    def test_saved_copy_can_be_opened(self):
+        file_id = self.data_manager.add_flb_file(self.flb_path)
+        self.data_manager.list_files()
+        copy_path = os.path.join(self.temp_dir.name, "copy.fldb")
+        self.assertTrue(self.data_manager.save_database(copy_path))
+
+        other = DataManager()
+        self.assertTrue(other.open_database(copy_path))
+        self.assertEqual(list(other.list_files()["File ID"]), [file_id])
+        other.add_flb_file(self.flb_path)
+        other.close()
+        self.assertEqual(len(self.data_manager.list_files()), 1)
+
+    @unittest.skipIf(App is None, "dearpygui is not installed")
+    def test_exported_copy_can_be_opened(self):
+        file_id = self.data_manager.add_flb_file(self.flb_path)
+        app = mock.Mock(data_manager=self.data_manager, _db_lock=threading.Lock())
+        copy_path = os.path.join(self.temp_dir.name, "export.fldb")
+        App._export_database(app, copy_path)
+
+        other = DataManager()
+        self.assertTrue(other.open_database(copy_path))
+        self.assertEqual(list(other.list_files()["File ID"]), [file_id])
+        other.close()
+
+    def test_raw_data_can_be_read_lazily_or_into_a_buffer(self):
+        file_id = self.data_manager.add_flb_file(self.flb_path)
+
+        file_data = self.data_manager.get_file_data(file_id, load=('metadata',))
+        self.assertEqual(set(file_data), {'file_id', 'metadata', 'raw_data'})
+        photon_data = file_data['raw_data']['photon_data']
+        self.assertIsInstance(photon_data, h5py.Dataset)
+        self.assertEqual(photon_data[:4].tolist(), [0, 1, 2, 3])
+
+        out = np.zeros(300, dtype=np.uint8)
+        file_data = self.data_manager.get_file_data(file_id, out=out)
+        self.assertEqual(file_data['raw_data']['photon_data'].tolist(), list(range(256)))
+        self.assertEqual(out[:256].tolist(), list(range(256)))
+        self.assertIsNot(self.data_manager.get_file_data(file_id)['raw_data']['photon_data'].base, out)
+
+    def test_new_database_uses_paged_file_space(self):
+        self.data_manager.add_flb_file(self.flb_path)
+        self.data_manager.close()
+        with h5py.File(self.data_manager.db_path, 'r') as f:
+            fcpl = f.id.get_create_plist()
+            self.assertEqual(fcpl.get_file_space_strategy()[0], h5py.h5f.FSPACE_STRATEGY_PAGE)
+            self.assertEqual(fcpl.get_file_space_page_size(), H5_FILE_SPACE_PAGE_BYTES)
+
+    def test_file_index_is_parsed_once_and_kept_in_step(self):
+        file_ids = [self.data_manager.add_flb_file(self.flb_path) for _ in range(3)]
+        with mock.patch('src.core.data_manager.read_file_index', wraps=read_file_index) as read_index:
+            for file_id in file_ids:
+                self.assertIsNotNone(self.data_manager.get_file_record(file_id))
+            self.assertTrue(self.data_manager.rename_file(file_ids[0], 'renamed.flb'))
+            self.assertTrue(self.data_manager.delete_file(file_ids[1]))
+            self.assertIsNotNone(self.data_manager.duplicate_file(file_ids[2]))
+            self.assertEqual(self.data_manager.get_database_info()['total files'], 3)
+            self.assertEqual(read_index.call_count, 1)
+
+        cached = self.data_manager._file_index
+        self.data_manager.close()
+        with h5py.File(self.data_manager.db_path, 'r') as f:
+            self.assertEqual(json.dumps(cached, sort_keys=True),
+                             json.dumps(read_file_index(f['metadata']), sort_keys=True))
+
+    def test_merge_writes_index_once(self):
+        other_path = os.path.join(self.temp_dir.name, "other.fldb")
+        other = DataManager()
+        other.create_database(other_path)
+        for _ in range(2):
+            original = other.add_flb_file(self.flb_path)
+        other.duplicate_file(original)
+        other.close()
+
+        with mock.patch('src.core.data_manager.write_file_index_entries',
+                        wraps=write_file_index_entries) as write_entries:
+            self.assertTrue(self.data_manager.merge_databases(other_path))
+            self.assertEqual(write_entries.call_count, 1)
+        files = self.data_manager.list_files()
+        self.assertEqual(len(files), 3)
+        self.assertEqual(set(files["File Name"]), {"sample.flb", "sample_copy.flb"})
+        with self.data_manager._open_db('r') as f:
+            self.assertEqual(sorted(f['files'].keys()), sorted(files["File ID"]))
+            raw_ids = {f['files'][file_id]['raw_data'].id for file_id in files["File ID"]}
+            self.assertEqual(len(raw_ids), 2)
+
+    def test_compaction_reclaims_deleted_space(self):
+        large_path = os.path.join(self.temp_dir.name, "large.flb")
+        with open(large_path, 'wb') as f:
+            f.write(np.random.default_rng(0).integers(0, 256, 4 * 1024 * 1024, dtype=np.uint8).tobytes())
+        deleted = self.data_manager.add_flb_file(large_path)
+        kept = [self.data_manager.add_flb_file(self.flb_path), self.data_manager.add_flb_file(large_path)]
+        self.assertTrue(self.data_manager.delete_file(deleted))
+        self.data_manager.close()
+        db_path = self.data_manager.db_path
+        size = os.path.getsize(db_path)
+
+        self.assertFalse(self.data_manager.compact_database(min_free_fraction=1.0))
+        self.assertTrue(self.data_manager.compact_database(min_free_fraction=0.2))
+        self.assertLess(os.path.getsize(db_path), size)
+        self.assertEqual(list(self.data_manager.list_files()["File ID"]), kept)
+        self.assertEqual(self.data_manager.get_file_data(kept[0])['raw_data']['photon_data'].tolist(), list(range(256)))
+
+    def test_duplicate_shares_raw_data_until_deep(self):
+        original = self.data_manager.add_flb_file(self.flb_path)
+        shallow = self.data_manager.duplicate_file(original)
+        deep = self.data_manager.duplicate_file(original, deep=True)
+        with self.data_manager._open_db('r') as f:
+            raw_data = f['files'][original]['raw_data']
+            self.assertEqual(f['files'][shallow]['raw_data'].id, raw_data.id)
+            self.assertNotEqual(f['files'][deep]['raw_data'].id, raw_data.id)
+
+        self.assertTrue(self.data_manager.delete_file(original))
+        self.assertTrue(self.data_manager.compact_database())
+        for file_id in (shallow, deep):
+            photon_data = self.data_manager.get_file_data(file_id)['raw_data']['photon_data']
+            self.assertEqual(photon_data.tolist(), list(range(256)))
+
+    def test_cached_file_data_survives_unrelated_writes(self):
+        first_id = self.data_manager.add_flb_file(self.flb_path)
+        file_data = self.data_manager.get_file_data(first_id)
+
+        second_id = self.data_manager.add_flb_file(self.flb_path)
+        self.assertIs(self.data_manager.get_file_data(first_id), file_data)
+        self.assertEqual(len(self.data_manager.list_files()), 2)
+
+        self.data_manager.rename_file(first_id, "renamed.flb")
+        self.assertIsNot(self.data_manager.get_file_data(first_id), file_data)
+        self.assertEqual(self.data_manager.get_file_data(first_id)['metadata']['file_name'], "renamed.flb")
+        self.assertIsNotNone(self.data_manager.get_file_data(second_id))
+
+    def test_missing_images_are_flagged_with_attributes(self):
+        file_id = self.data_manager.add_flb_file(self.flb_path)
+        with h5py.File(self.data_manager.db_path, 'r') as f:
+            raw_group = f[f'files/{file_id}/raw_data']
+            self.assertEqual(list(raw_group.keys()), ['photon_data'])
+            self.assertFalse(raw_group.attrs['has_alignment_image'])
+
+        raw_data = self.data_manager.get_file_data(file_id)['raw_data']
+        self.assertIsNone(raw_data['alignment_image'])
+        self.assertIsNone(raw_data['laser_on_image'])
+        self.assertEqual(raw_data['photon_data'].tobytes(), bytes(range(256)))
+
+    def test_read_handle_is_reused_between_writes(self):
+        file_id = self.data_manager.add_flb_file(self.flb_path)
+        self.data_manager.flush_index()
+        with mock.patch('h5py.File', wraps=h5py.File) as h5_file:
+            self.data_manager.list_files()
+            self.data_manager.get_file_data(file_id)
+            self.data_manager.get_file_record(file_id)
+            self.assertEqual(h5_file.call_count, 1)
+            self.assertEqual(self.data_manager._h5.mode, 'r')
+
+            # A write reopens the database for writing and closes it when done
+            self.data_manager.add_flb_file(self.flb_path)
+            self.assertEqual(h5_file.call_count, 2)
+            self.assertIsNone(self.data_manager._h5)
+
+        with self.data_manager:
+            pass
+        with h5py.File(self.data_manager.db_path, 'r+'):
+            pass
+        self.assertEqual(len(self.data_manager.list_files()), 2)
+
+    def test_healthy_database_is_not_opened_for_repair(self):
+        self.data_manager.add_flb_file(self.flb_path)
+        self.data_manager.flush_index()
+        with mock.patch.object(self.data_manager, '_open_db', wraps=self.data_manager._open_db) as open_db:
+            self.assertFalse(self.data_manager._attempt_metadata_repair())
+            self.assertEqual([c.args[0] for c in open_db.call_args_list], ['r'])
+
+    def test_reopening_unchanged_database_skips_structure_check(self):
+        db_path = self.data_manager.db_path
+        self.assertTrue(self.data_manager.open_database(db_path))
+        with mock.patch.object(self.data_manager, '_open_db', side_effect=OSError) as open_db:
+            self.assertTrue(self.data_manager.open_database(db_path))
+            open_db.assert_not_called()
+
+        self.data_manager.add_flb_file(self.flb_path)
+        with mock.patch.object(self.data_manager, '_open_db', side_effect=OSError):
+            self.assertFalse(self.data_manager.open_database(db_path))
+
+class TestBatchedReads(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_manager = DataManager()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_blobs_are_yielded_in_order(self):
+        paths = []
+        for i in range(20):
+            path = os.path.join(self.temp_dir.name, f"{i}.flb")
+            with open(path, 'wb') as f:
+                f.write(bytes([i]) * (i + 1))
+            paths.append(path)
+        paths.append(os.path.join(self.temp_dir.name, "missing.flb"))
+
+        blobs = list(self.data_manager.read_blobs_batched(paths, prefetch=4))
+        self.assertEqual([path for path, _ in blobs], paths)
+        self.assertEqual([data for _, data in blobs[:-1]], [bytes([i]) * (i + 1) for i in range(20)])
+        self.assertIsNone(blobs[-1][1])
+
+    def test_add_files_as_one_batch(self):
+        self.data_manager.create_database(os.path.join(self.temp_dir.name, "test.fldb"))
+        paths = []
+        for name in ("a.flr", "b.flb", "c.txt"):
+            path = os.path.join(self.temp_dir.name, name)
+            with open(path, 'wb') as f:
+                f.write(b"\x01\x02")
+            paths.append(path)
+
+        file_ids = self.data_manager.add_files(paths)
+        self.assertIsNone(file_ids[2])
+        files = self.data_manager.list_files()
+        self.assertEqual(sorted(files["File ID"]), sorted(file_ids[:2]))
+        self.assertEqual(sorted(files["File Name"]), ["a.flr", "b.flb"])
+
+    def test_add_files_decodes_flz_files_in_order(self):
+        self.data_manager.create_database(os.path.join(self.temp_dir.name, "test.fldb"))
+        paths = []
+        for name in ("a.flz", "b.flr", "bad.flz", "c.flz"):
+            path = os.path.join(self.temp_dir.name, name)
+            if name == "bad.flz":
+                with open(path, 'wb') as f:
+                    f.write(b"not a zip file")
+            elif name.endswith(".flz"):
+                with zipfile.ZipFile(path, 'w') as zip_file:
+                    zip_file.writestr('metadata.json', json.dumps({'name': name}))
+                    zip_file.writestr('photon_data.flr', name.encode('utf-8'))
+            else:
+                with open(path, 'wb') as f:
+                    f.write(b"\x01\x02")
+            paths.append(path)
+
+        file_ids = self.data_manager.add_files(paths)
+        self.assertIsNone(file_ids[2])
+        self.assertTrue(all(file_ids[i] for i in (0, 1, 3)))
+        for i in (0, 3):
+            file_data = self.data_manager.get_file_data(file_ids[i])
+            self.assertEqual(file_data['metadata'], {'name': os.path.basename(paths[i])})
+            self.assertEqual(file_data['raw_data']['photon_data'].tobytes(), os.path.basename(paths[i]).encode('utf-8'))
+
+    def test_photon_data_is_streamed_in_chunks(self):
+        self.data_manager.create_database(os.path.join(self.temp_dir.name, "test.fldb"))
+        path = os.path.join(self.temp_dir.name, "large.flr")
+        payload = bytes(range(256)) * (PHOTON_DATA_CHUNK_BYTES // 256 + 3)
+        with open(path, 'wb') as f:
+            f.write(payload)
+
+        file_id = self.data_manager.add_flr_file(path)
+        self.assertEqual(self.data_manager.get_file_data(file_id)['raw_data']['photon_data'].tobytes(), payload)
+        self.assertIsNone(self.data_manager.add_flr_file(os.path.join(self.temp_dir.name, "missing.flr")))
+        self.assertEqual(len(self.data_manager.list_files()), 1)
+
+        self.data_manager.close()
+        with h5py.File(self.data_manager.db_path, 'r') as f:
+            photon_data = f[f'files/{file_id}/raw_data/photon_data']
+            self.assertEqual(photon_data.chunks, (PHOTON_DATA_CHUNK_BYTES,))
+            self.assertGreater(photon_data.id.get_create_plist().get_nfilters(), 0)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,24 @@
+import unittest
+import numpy as np
+from unittest import mock
+from src.analysis.signal_processing import deadtime_correction
+
+class TestDeadtimeCorrection(unittest.TestCase):
+
+    def expected(self, count_rate, deadtime):
+        return np.clip(count_rate / (1 - count_rate * 1e6 * deadtime), 0, 12)
+
+    def test_numpy_fallback_accepts_scalars_and_arrays(self):
+        count_rates = np.array([0.0, 1.0, 5.0, 15.0])
+        with mock.patch('src.analysis.signal_processing.NUMBA_AVAILABLE', False), \
+             mock.patch('src.analysis.signal_processing.NUMEXPR_AVAILABLE', False):
+            corrected = deadtime_correction(5.0, 62e-9)
+            self.assertEqual(np.shape(corrected), ())
+            self.assertAlmostEqual(float(corrected), self.expected(5.0, 62e-9))
+
+            corrected = deadtime_correction(count_rates, 62e-9)
+            np.testing.assert_allclose(corrected, self.expected(count_rates, 62e-9))
+            self.assertEqual(corrected[-1], 12)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+import warnings
+import numpy as np
+import pandas as pd
+from src.analysis.statistical import calculate_mean, calculate_std_dev
+
+class TestStatistical(unittest.TestCase):
+
+    def test_non_numeric_values_are_skipped(self):
+        df = pd.DataFrame({'mixed': [1, 'x', 3.0, None, '5']})
+        self.assertEqual(calculate_mean(df, 'mixed'), 3.0)
+        self.assertEqual(calculate_std_dev(df, 'mixed'), 2.0)
+        self.assertEqual(calculate_mean(np.array([1, 'x', 3], dtype=object), None), 2.0)
+        self.assertIsNone(calculate_mean(df, 'missing'))
+
+    def test_too_few_values_give_nan_without_warnings(self):
+        one_row = pd.DataFrame({'value': [4.0], 'text': ['x']})
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            self.assertEqual(calculate_mean(one_row, 'value'), 4.0)
+            self.assertTrue(np.isnan(calculate_std_dev(one_row, 'value')))
+            self.assertTrue(np.isnan(calculate_mean(one_row, 'text')))
+            self.assertTrue(np.isnan(calculate_std_dev(one_row.iloc[:0], 'value')))
+
+if __name__ == '__main__':
+    unittest.main()